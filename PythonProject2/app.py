@@ -1,22 +1,109 @@
 ﻿import calendar as pycalendar
+import multiprocessing
 import os
-import re
+import signal
+import threading
+import time
 import uuid
-from datetime import date
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, send_from_directory
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import click
+from flask import (
+    Flask,
+    Request,
+    Response,
+    abort,
+    flash,
+    get_flashed_messages,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_template,
+    url_for,
+)
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from sqlalchemy import inspect, text, func
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.orm import joinedload, load_only, make_transient_to_detached
 from werkzeug.utils import secure_filename
 
+from assets import AssetManifest, build_assets
+from caching import RenderedPageCache, TTLCache
+from compression import GzipMiddleware
 from config import Config
-from models import db, User, Submission
-from olympiad_parser import fetch_olympiad_news
+from date_parsing import parse_event_dates
+from file_delivery import DELIVERY_MODES, send_upload
+from jobs import enqueue, run_worker
+from migrations import LATEST_VERSION, schema_is_current, upgrade_schema
+from password_hashing import HashingBusyError, hasher
+from upload_storage import (
+    SpooledUpload,
+    UploadFormDataParser,
+    UploadTooLargeError,
+    commit_staged,
+    release_uploads,
+    session_part_path,
+    stage_file,
+    write_chunk,
+)
+from models import db, install_sqlite_pragmas, ContentVersion, User, Submission, ScrapedItem, UploadSession
+from olympiad_parser import (
+    add_refresh_listener,
+    configure_cache,
+    configure_page_cache,
+    fetch_olympiad_news,
+    seed_snapshot,
+    snapshot_version,
+    start_background_refresh,
+    stop_background_refresh,
+)
+from scrape_cache import PageCache, cache_backend_from_url
+from search_index import index_submissions, search as search_submissions, unindex_submissions
+from storage_reconciler import reconcile_all, schedule_reconciler
+import upload_processing  # noqa: F401  registers the process_submission job
+
+
+class UploadRequest(Request):
+    """Writes multipart file parts straight into the upload store.
+
+    The limit for a part follows its form field (``video`` gets
+    UPLOAD_MAX_VIDEO_BYTES, anything else UPLOAD_MAX_FILE_BYTES), so an
+    oversized file fails with UploadTooLargeError while it is still arriving.
+    """
+
+    form_data_parser_class = UploadFormDataParser
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+        parser.field_limits = {field: app.config[limit] for field, (_, limit) in UPLOAD_KINDS.items()}
+        return parser
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        spool = SpooledUpload(app.config['UPLOAD_ROOT'], extension, app.config['UPLOAD_MAX_FILE_BYTES'])
+        self.__dict__.setdefault('upload_spools', []).append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        # Parts of a request that failed while parsing never reached request.files.
+        for spool in self.__dict__.get('upload_spools', ()):
+            spool.close()
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config.from_object(Config)
 
 # Инициализация расширений
 db.init_app(app)
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -27,6 +114,26 @@ FILES_DIR = os.path.join(UPLOAD_ROOT, "files")
 VIDEOS_DIR = os.path.join(UPLOAD_ROOT, "videos")
 os.makedirs(FILES_DIR, exist_ok=True)
 os.makedirs(VIDEOS_DIR, exist_ok=True)
+app.config.setdefault('UPLOAD_ROOT', UPLOAD_ROOT)
+
+configure_cache(
+    cache_backend_from_url(
+        app.config['SCRAPE_CACHE_URL']
+        or 'sqlite:///' + os.path.join(app.instance_path, 'scrape_cache.db')
+    )
+)
+configure_page_cache(
+    PageCache(app.config['SCRAPE_HTTP_CACHE_DIR'] or os.path.join(app.instance_path, 'http_cache'))
+)
+
+THEORY_PAGE_SIZE = 20
+ADMIN_PAGE_SIZE = 50
+# Rows fetched per round trip while a list page streams.
+STREAM_BATCH_SIZE = 10
+# How often a worker started on an outdated schema checks for the upgrade.
+SCHEMA_RECHECK_SECONDS = 5
+# ContentVersion counter behind the cached theory pages; bumped on every submission write.
+SUBMISSIONS_VERSION = 'submissions'
 
 ALLOWED_FILE_EXTS = {"pdf", "doc", "docx", "txt", "zip"}
 ALLOWED_VIDEO_EXTS = {"mp4", "webm", "mov"}
@@ -47,88 +154,59 @@ MONTH_LABELS_RU = [
     "Декабрь",
 ]
 WEEKDAY_LABELS_RU = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-MONTH_KEYWORDS_RU = {
-    "янв": 1,
-    "январ": 1,
-    "фев": 2,
-    "феврал": 2,
-    "мар": 3,
-    "март": 3,
-    "апр": 4,
-    "апрел": 4,
-    "май": 5,
-    "мая": 5,
-    "июн": 6,
-    "июнь": 6,
-    "июня": 6,
-    "июл": 7,
-    "июль": 7,
-    "июля": 7,
-    "авг": 8,
-    "август": 8,
-    "сен": 9,
-    "сент": 9,
-    "сентябр": 9,
-    "окт": 10,
-    "октябр": 10,
-    "ноя": 11,
-    "нояб": 11,
-    "ноябр": 11,
-    "дек": 12,
-    "декабр": 12,
-}
 
+if app.config['FILE_DELIVERY'] not in DELIVERY_MODES:
+    raise ValueError(f"FILE_DELIVERY must be one of {', '.join(DELIVERY_MODES)}")
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+hasher.configure(
+    app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT_SECONDS'],
+    app_processes=app.config['APP_PROCESSES'],
+)
 
+if app.config['COMPRESS_RESPONSES']:
+    app.wsgi_app = GzipMiddleware(
+        app.wsgi_app, min_size=app.config['COMPRESS_MIN_SIZE'], level=app.config['COMPRESS_LEVEL']
+    )
 
-def _parse_event_date(raw_value):
-    if not raw_value:
-        return None
+asset_manifest = AssetManifest(app.static_folder)
+app.jinja_env.globals['asset_url'] = asset_manifest.url
 
-    text = str(raw_value).strip().lower()
-    if not text:
-        return None
+page_cache = RenderedPageCache(app.config['PAGE_CACHE_MAX_BYTES'], app.config['COMPRESS_LEVEL'])
+user_cache = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL_SECONDS'])
 
-    text = text.replace("–", "-").replace("—", "-")
-    if re.search(r"\b20\d{2}\s*-\s*20\d{2}\b", text):
-        return None
+# Rendered calendar views keyed by the event list; dropped when the month rolls over.
+CALENDAR_VIEW_CACHE_SIZE = 16
+_calendar_view_cache = {"months": None, "views": OrderedDict()}
+_calendar_view_lock = threading.Lock()
 
-    match = re.search(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})\b", text)
-    if match:
-        day, month, year = match.groups()
-        if len(year) == 2:
-            year = f"20{year}"
-        try:
-            return date(int(year), int(month), int(day))
-        except ValueError:
-            return None
 
-    match = re.search(r"\b(20\d{2})[./-](\d{1,2})[./-](\d{1,2})\b", text)
-    if match:
-        year, month, day = match.groups()
-        try:
-            return date(int(year), int(month), int(day))
-        except ValueError:
-            return None
-
-    match = re.search(r"\b(\d{1,2})\s+([a-zа-яё]+)\s+(\d{4})\b", text)
-    if match:
-        day, month_word, year = match.groups()
-        month_num = None
-        for key, value in MONTH_KEYWORDS_RU.items():
-            if month_word.startswith(key):
-                month_num = value
-                break
-        if month_num:
-            try:
-                return date(int(year), int(month_num), int(day))
-            except ValueError:
-                return None
-
-    return None
+def _persist_scraped_snapshot(kind, snapshot):
+    with app.app_context():
+        ScrapedItem.store_snapshot(kind, snapshot['items'], snapshot['ts'])
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    columns = user_cache.get(user_id)
+    if columns is None:
+        user = User.query.get(user_id)
+        if user is not None:
+            user_cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+        return user
+    # Rebuild a clean instance from the cached row and attach it without a SELECT.
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
 
 
 def _get_months_to_show(current_date=None):
@@ -146,12 +224,46 @@ def _get_months_to_show(current_date=None):
 
 
 def _build_calendar_view(items):
+    months_to_show = tuple(_get_months_to_show())
+    fingerprint = tuple(tuple(sorted(item.items())) for item in items)
+    with _calendar_view_lock:
+        if _calendar_view_cache["months"] != months_to_show:
+            _calendar_view_cache["months"] = months_to_show
+            _calendar_view_cache["views"].clear()
+        views = _calendar_view_cache["views"]
+        if fingerprint in views:
+            views.move_to_end(fingerprint)
+            return views[fingerprint]
+
+    view = _render_calendar_view(items, months_to_show)
+    with _calendar_view_lock:
+        if _calendar_view_cache["months"] == months_to_show:
+            views = _calendar_view_cache["views"]
+            views[fingerprint] = view
+            while len(views) > CALENDAR_VIEW_CACHE_SIZE:
+                views.popitem(last=False)
+    return view
+
+
+@lru_cache(maxsize=24)
+def _month_skeleton(year, month):
+    # Cells without events are shared between views, so they must not be mutated.
+    cal = pycalendar.Calendar(firstweekday=0)
+    return tuple(
+        tuple(
+            {"day": day.day, "date": day.isoformat(), "events": ()} if day.month == month else None
+            for day in week
+        )
+        for week in cal.monthdatescalendar(year, month)
+    )
+
+
+def _render_calendar_view(items, months_to_show):
     events_by_date = {}
     undated = []
-    months_to_show = _get_months_to_show()
     months_set = set(months_to_show)
-    for item in items:
-        parsed = _parse_event_date(item.get("date"))
+    parsed_dates = parse_event_dates([item.get("date") for item in items])
+    for item, parsed in zip(items, parsed_dates):
         if not parsed:
             undated.append(item)
             continue
@@ -162,26 +274,18 @@ def _build_calendar_view(items):
         key = parsed.isoformat()
         events_by_date.setdefault(key, []).append(item)
 
-    months = list(months_to_show)
     calendar_months = []
-    cal = pycalendar.Calendar(firstweekday=0)
-    for year, month in months:
+    for year, month in months_to_show:
         weeks = []
-        for week in cal.monthdatescalendar(year, month):
-            week_cells = []
-            for day in week:
-                if day.month != month:
-                    week_cells.append(None)
-                else:
-                    key = day.isoformat()
-                    week_cells.append(
-                        {
-                            "day": day.day,
-                            "date": key,
-                            "events": events_by_date.get(key, []),
-                        }
-                    )
-            weeks.append(week_cells)
+        for week in _month_skeleton(year, month):
+            weeks.append(
+                [
+                    dict(cell, events=events_by_date[cell["date"]])
+                    if cell and cell["date"] in events_by_date
+                    else cell
+                    for cell in week
+                ]
+            )
         calendar_months.append(
             {
                 "month_label": f"{MONTH_LABELS_RU[month]} {year}",
@@ -191,6 +295,126 @@ def _build_calendar_view(items):
     return calendar_months, undated
 
 
+def _cached_page(version, render, stream=None):
+    """Serve ``render()`` from the page cache for anonymous visitors.
+
+    ``version`` must change whenever the data behind the page changes. Pages
+    carry a strong ETag, so repeat visits get a 304 without a body; the gzip
+    variant is cached with the page. Requests that cannot be cached get
+    ``stream()`` instead, when the view offers one.
+    """
+    if current_user.is_authenticated or session.get('_flashes'):
+        return (stream or render)()
+    key = (request.endpoint, request.query_string, version)
+    entry = page_cache.get(key)
+    if entry is None:
+        entry = page_cache.set(key, render())
+    if app.config['COMPRESS_RESPONSES'] and request.accept_encodings['gzip']:
+        response = make_response(entry.gzip_body)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f'{entry.etag}-gz')
+    else:
+        response = make_response(entry.body)
+        response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+def _stream_page(template, **context):
+    """Send ``template`` in chunks as Jinja renders it, with the rows fetched along the way."""
+    if request.method == 'HEAD':
+        # Werkzeug drops a HEAD body without closing it, which would leak the streamed context.
+        return render_template(template, **context)
+    # The session cookie is written before the body, so flashes must leave it now.
+    get_flashed_messages(with_categories=True)
+    return Response(stream_template(template, **context))
+
+
+def _decode_cursor(raw_cursor):
+    if not raw_cursor:
+        return None
+    created_at, _, submission_id = raw_cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), int(submission_id)
+    except ValueError:
+        abort(400)
+
+
+def _encode_cursor(submission):
+    return f"{submission.created_at.isoformat()}_{submission.id}"
+
+
+def _listing_options(*extra_columns):
+    """Load only the columns the list templates use, with authors from the same query."""
+    return (
+        load_only(
+            Submission.id,
+            Submission.user_id,
+            Submission.title,
+            Submission.description,
+            Submission.file_name,
+            Submission.video_name,
+            Submission.status,
+            Submission.created_at,
+            *extra_columns,
+        ),
+        joinedload(Submission.user).load_only(User.username),
+    )
+
+
+class SubmissionPage:
+    """One page of submissions, fetched lazily while the template iterates it.
+
+    Truthiness peeks at the first row only. ``next_cursor`` is known once the
+    rows have been iterated, so templates read it after the loop.
+    """
+
+    def __init__(self, query, page_size):
+        self._rows = iter(query.limit(page_size + 1).yield_per(STREAM_BATCH_SIZE))
+        self._first = next(self._rows, None)
+        self.page_size = page_size
+        self.next_cursor = None
+
+    def __bool__(self):
+        return self._first is not None
+
+    def __iter__(self):
+        if self._first is None:
+            return
+        last, shown = self._first, 1
+        yield last
+        # Drain the result rather than break, so the cursor is closed; at most one row is left.
+        for row in self._rows:
+            if shown == self.page_size:
+                self.next_cursor = _encode_cursor(last)
+                continue
+            last, shown = row, shown + 1
+            yield row
+
+
+def _submission_page(query, page_size, *extra_columns):
+    """Return one page of ``query`` ordered newest first as a SubmissionPage.
+
+    Pages are addressed by the (created_at, id) of the last row shown, so every
+    page costs the same regardless of depth.
+    """
+    query = query.options(*_listing_options(*extra_columns)).order_by(
+        Submission.created_at.desc(), Submission.id.desc()
+    )
+    cursor = _decode_cursor(request.args.get('cursor'))
+    if cursor:
+        created_at, submission_id = cursor
+        query = query.filter(
+            or_(
+                Submission.created_at < created_at,
+                and_(Submission.created_at == created_at, Submission.id < submission_id),
+            )
+        )
+    return SubmissionPage(query, page_size)
+
+
 def _allowed_file(filename, allowed_exts):
     if not filename or "." not in filename:
         return False
@@ -198,14 +422,16 @@ def _allowed_file(filename, allowed_exts):
     return ext in allowed_exts
 
 
-def _save_upload(file_storage, target_dir):
-    original_name = secure_filename(file_storage.filename)
-    extension = os.path.splitext(original_name)[1].lower()
-    unique_name = f"{uuid.uuid4().hex}{extension}"
-    file_path = os.path.join(target_dir, unique_name)
-    file_storage.save(file_path)
-    relative_path = os.path.relpath(file_path, UPLOAD_ROOT)
-    return original_name, relative_path
+def _stage_upload(file_storage):
+    return secure_filename(file_storage.filename), file_storage.stream.stage()
+
+
+def _queue_processing(submission):
+    """Add ``submission`` and schedule its inspection; both land in the caller's commit."""
+    submission.processing_state = 'pending'
+    db.session.add(submission)
+    db.session.flush()
+    enqueue('process_submission', {'submission_id': submission.id})
 
 
 def _require_admin():
@@ -213,12 +439,9 @@ def _require_admin():
         abort(403)
 
 
-def _delete_upload(relative_path):
-    if not relative_path:
-        return
-    abs_path = os.path.join(UPLOAD_ROOT, relative_path)
-    if os.path.isfile(abs_path):
-        os.remove(abs_path)
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    return asset_manifest.send(filename)
 
 
 @app.route('/')
@@ -284,28 +507,70 @@ def index():
 
     olympiad_calendar = base_calendar
     olympiad_news = fetch_olympiad_news()
-    calendar_months, undated_events = _build_calendar_view(olympiad_calendar)
 
-    return render_template(
-        'index.html',
-        olympiad_calendar=olympiad_calendar,
-        olympiad_news=olympiad_news,
-        calendar_months=calendar_months,
-        undated_events=undated_events,
-        weekday_labels=WEEKDAY_LABELS_RU,
-    )
+    def render():
+        calendar_months, undated_events = _build_calendar_view(olympiad_calendar)
+        return render_template(
+            'index.html',
+            olympiad_calendar=olympiad_calendar,
+            olympiad_news=olympiad_news,
+            calendar_months=calendar_months,
+            undated_events=undated_events,
+            weekday_labels=WEEKDAY_LABELS_RU,
+        )
+
+    return _cached_page((snapshot_version('news'), date.today().isoformat()), render)
 
 
 @app.route('/theory')
 def theory():
-    submissions = Submission.query.filter_by(status='approved').order_by(Submission.created_at.desc()).all()
-    return render_template('theory.html', submissions=submissions)
+    def context():
+        return {
+            'submissions': _submission_page(Submission.query.filter_by(status='approved'), THEORY_PAGE_SIZE),
+            'is_first_page': not request.args.get('cursor'),
+        }
+
+    return _cached_page(
+        ContentVersion.current(SUBMISSIONS_VERSION),
+        lambda: render_template('theory.html', **context()),
+        stream=lambda: _stream_page('theory.html', **context()),
+    )
+
+
+@app.route('/theory/search')
+def theory_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return redirect(url_for('theory'))
+    page = max(request.args.get('page', 1, type=int), 1)
+    ids = search_submissions(query, THEORY_PAGE_SIZE + 1, (page - 1) * THEORY_PAGE_SIZE)
+    has_next = len(ids) > THEORY_PAGE_SIZE
+    ids = ids[:THEORY_PAGE_SIZE]
+    found = {}
+    if ids:
+        found = {
+            submission.id: submission
+            for submission in Submission.query.options(*_listing_options()).filter(Submission.id.in_(ids))
+        }
+    return render_template(
+        'theory.html',
+        submissions=[found[submission_id] for submission_id in ids if submission_id in found],
+        search_query=query,
+        page=page,
+        has_next=has_next,
+    )
 
 
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
     if request.method == 'POST':
+        try:
+            # Parsing writes the files to the upload store and checks their size limits.
+            request.files
+        except UploadTooLargeError as exc:
+            flash(f'Слишком большой файл: не более {exc.max_bytes // (1024 * 1024)} МБ.', 'error')
+            return redirect(url_for('upload'))
         title = request.form.get('title', '').strip()
         description = request.form.get('description', '').strip()
         file = request.files.get('file')
@@ -319,33 +584,34 @@ def upload():
             flash('Добавьте файл или видео для отправки на модерацию.', 'error')
             return redirect(url_for('upload'))
 
-        file_name = None
-        file_path = None
-        if file and file.filename:
-            if not _allowed_file(file.filename, ALLOWED_FILE_EXTS):
-                flash('Недопустимый формат файла.', 'error')
-                return redirect(url_for('upload'))
-            file_name, file_path = _save_upload(file, FILES_DIR)
-
-        video_name = None
-        video_path = None
-        if video and video.filename:
-            if not _allowed_file(video.filename, ALLOWED_VIDEO_EXTS):
-                flash('Недопустимый формат видео.', 'error')
-                return redirect(url_for('upload'))
-            video_name, video_path = _save_upload(video, VIDEOS_DIR)
+        has_file = bool(file and file.filename)
+        has_video = bool(video and video.filename)
+        if has_file and not _allowed_file(file.filename, ALLOWED_FILE_EXTS):
+            flash('Недопустимый формат файла.', 'error')
+            return redirect(url_for('upload'))
+        if has_video and not _allowed_file(video.filename, ALLOWED_VIDEO_EXTS):
+            flash('Недопустимый формат видео.', 'error')
+            return redirect(url_for('upload'))
+
+        file_name = video_name = None
+        staged_file = staged_video = None
+        if has_file:
+            file_name, staged_file = _stage_upload(file)
+        if has_video:
+            video_name, staged_video = _stage_upload(video)
 
         submission = Submission(
             user_id=current_user.id,
             title=title,
             description=description or None,
             file_name=file_name,
-            file_path=file_path,
+            file_path=commit_staged(staged_file, UPLOAD_ROOT) if staged_file else None,
             video_name=video_name,
-            video_path=video_path,
+            video_path=commit_staged(staged_video, UPLOAD_ROOT) if staged_video else None,
             status='pending',
         )
-        db.session.add(submission)
+        _queue_processing(submission)
+        ContentVersion.bump(SUBMISSIONS_VERSION)
         db.session.commit()
         flash('Материалы отправлены на одобрение администратора.', 'success')
         return redirect(url_for('upload'))
@@ -354,21 +620,263 @@ def upload():
     return render_template('upload.html', submissions=submissions)
 
 
+# Resumable uploads (tus-style): POST /uploads opens a session, PATCH appends a
+# chunk at Upload-Offset, HEAD reports how much arrived, and
+# POST /uploads/complete turns finished sessions into a Submission.
+UPLOAD_KINDS = {
+    'file': (ALLOWED_FILE_EXTS, 'UPLOAD_MAX_FILE_BYTES'),
+    'video': (ALLOWED_VIDEO_EXTS, 'UPLOAD_MAX_VIDEO_BYTES'),
+}
+STALE_SESSION_BATCH = 50
+
+
+def _upload_error(message, status):
+    return jsonify({'error': message}), status
+
+
+def _upload_offset_response(upload_session, status=204):
+    response = make_response('', status)
+    response.headers['Upload-Offset'] = str(upload_session.received)
+    response.headers['Upload-Length'] = str(upload_session.length)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _get_upload_session(session_id):
+    upload_session = db.session.get(UploadSession, session_id)
+    if upload_session is None or upload_session.user_id != current_user.id:
+        abort(404)
+    return upload_session
+
+
+def _discard_upload_session(upload_session):
+    part_path = session_part_path(UPLOAD_ROOT, upload_session.id)
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    db.session.delete(upload_session)
+
+
+def _collect_stale_upload_sessions(limit=STALE_SESSION_BATCH):
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['UPLOAD_SESSION_TTL_SECONDS'])
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).limit(limit).all()
+    for upload_session in stale:
+        _discard_upload_session(upload_session)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+@app.post('/uploads')
+@login_required
+def create_upload_session():
+    kind = request.form.get('kind', '')
+    filename = request.form.get('filename', '')
+    if kind not in UPLOAD_KINDS:
+        return _upload_error('Неизвестный тип загрузки.', 400)
+    allowed_exts, limit_key = UPLOAD_KINDS[kind]
+    if not _allowed_file(filename, allowed_exts):
+        return _upload_error('Недопустимый формат файла.', 400)
+    try:
+        length = int(request.headers.get('Upload-Length') or request.form.get('length', ''))
+    except ValueError:
+        return _upload_error('Не указан размер файла.', 400)
+    if length <= 0:
+        return _upload_error('Пустой файл.', 400)
+    if length > app.config[limit_key]:
+        return _upload_error(f'Слишком большой файл: не более {app.config[limit_key] // (1024 * 1024)} МБ.', 413)
+
+    _collect_stale_upload_sessions()
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        kind=kind,
+        filename=secure_filename(filename),
+        length=length,
+    )
+    db.session.add(upload_session)
+    db.session.commit()
+    response = _upload_offset_response(upload_session, 201)
+    response.headers['Location'] = url_for('upload_session_status', session_id=upload_session.id)
+    return response
+
+
+@app.route('/uploads/<session_id>', methods=['HEAD'])
+@login_required
+def upload_session_status(session_id):
+    return _upload_offset_response(_get_upload_session(session_id), 200)
+
+
+@app.route('/uploads/<session_id>', methods=['PATCH'])
+@login_required
+def append_upload_chunk(session_id):
+    upload_session = _get_upload_session(session_id)
+    if request.mimetype != 'application/offset+octet-stream':
+        return _upload_error('Ожидается Content-Type: application/offset+octet-stream.', 415)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return _upload_error('Не указан Upload-Offset.', 400)
+    if offset != upload_session.received:
+        return _upload_offset_response(upload_session, 409)
+
+    part_path = session_part_path(UPLOAD_ROOT, upload_session.id)
+    try:
+        written = write_chunk(part_path, offset, request.stream, upload_session.length - offset)
+    except UploadTooLargeError:
+        return _upload_error('Данных больше, чем объявленный размер файла.', 413)
+
+    # Only the request whose offset is still current may advance it.
+    advanced = UploadSession.query.filter_by(id=upload_session.id, received=offset).update(
+        {'received': offset + written}, synchronize_session=False
+    )
+    db.session.commit()
+    db.session.refresh(upload_session)
+    return _upload_offset_response(upload_session, 204 if advanced else 409)
+
+
+@app.route('/uploads/<session_id>', methods=['DELETE'])
+@login_required
+def cancel_upload_session(session_id):
+    _discard_upload_session(_get_upload_session(session_id))
+    db.session.commit()
+    return '', 204
+
+
+@app.post('/uploads/complete')
+@login_required
+def complete_upload_sessions():
+    title = request.form.get('title', '').strip()
+    description = request.form.get('description', '').strip()
+    if not title:
+        return _upload_error('Укажите название темы.', 400)
+
+    sessions = {}
+    for kind in UPLOAD_KINDS:
+        session_id = request.form.get(f'{kind}_upload')
+        if not session_id:
+            continue
+        upload_session = _get_upload_session(session_id)
+        if upload_session.kind != kind:
+            return _upload_error('Неверный тип загрузки.', 400)
+        if not upload_session.is_complete:
+            return _upload_offset_response(upload_session, 409)
+        sessions[kind] = upload_session
+    if not sessions:
+        return _upload_error('Добавьте файл или видео для отправки на модерацию.', 400)
+
+    stored = {}
+    for kind, upload_session in sessions.items():
+        extension = os.path.splitext(upload_session.filename)[1].lower()
+        staged = stage_file(session_part_path(UPLOAD_ROOT, upload_session.id), extension)
+        stored[kind] = (upload_session.filename, commit_staged(staged, UPLOAD_ROOT))
+        db.session.delete(upload_session)
+
+    file_name, file_path = stored.get('file', (None, None))
+    video_name, video_path = stored.get('video', (None, None))
+    submission = Submission(
+        user_id=current_user.id,
+        title=title,
+        description=description or None,
+        file_name=file_name,
+        file_path=file_path,
+        video_name=video_name,
+        video_path=video_path,
+        status='pending',
+    )
+    _queue_processing(submission)
+    ContentVersion.bump(SUBMISSIONS_VERSION)
+    db.session.commit()
+    flash('Материалы отправлены на одобрение администратора.', 'success')
+    return jsonify({'id': submission.id, 'redirect': url_for('upload')}), 201
+
+
 @app.route('/admin/submissions')
 @login_required
 def admin_submissions():
     _require_admin()
-    submissions = Submission.query.order_by(Submission.created_at.desc()).all()
-    return render_template('admin_submissions.html', submissions=submissions)
+    return _stream_page(
+        'admin_submissions.html',
+        submissions=_submission_page(
+            Submission.query, ADMIN_PAGE_SIZE, Submission.processing_state, Submission.file_meta
+        ),
+        is_first_page=not request.args.get('cursor'),
+    )
+
+
+@app.route('/admin/metrics/hashing')
+@login_required
+def admin_hashing_metrics():
+    _require_admin()
+    return jsonify(hasher.stats())
+
+
+MODERATION_STATUSES = {'approve': 'approved', 'reject': 'rejected'}
+MAX_BULK_IDS = 1000
+
+
+def _moderate(ids, action):
+    """Apply one moderation action to ``ids`` in a single transaction; returns the number of rows hit.
+
+    Status changes are one UPDATE, deletion is one DELETE; files no longer
+    referenced by any submission are unlinked by a background job.
+    """
+    if action == 'delete':
+        rows = db.session.execute(
+            select(Submission.file_path, Submission.video_path).where(Submission.id.in_(ids))
+        ).all()
+        unused_paths = release_uploads(path for row in rows for path in row)
+        unindex_submissions(ids)
+        count = Submission.query.filter(Submission.id.in_(ids)).delete(synchronize_session=False)
+        if unused_paths:
+            enqueue('remove_uploads', {'paths': unused_paths})
+    else:
+        status = MODERATION_STATUSES[action]
+        count = Submission.query.filter(Submission.id.in_(ids)).update(
+            {'status': status}, synchronize_session=False
+        )
+        if action == 'approve':
+            index_submissions(ids)
+        else:
+            unindex_submissions(ids)
+    ContentVersion.bump(SUBMISSIONS_VERSION)
+    db.session.commit()
+    return count
+
+
+@app.post('/admin/submissions/bulk')
+@login_required
+def bulk_moderate_submissions():
+    _require_admin()
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None:
+        if not isinstance(payload, dict) or not isinstance(payload.get('ids', []), list):
+            abort(400)
+        action = payload.get('action')
+        try:
+            ids = sorted({int(submission_id) for submission_id in payload.get('ids', [])})
+        except (TypeError, ValueError):
+            abort(400)
+    else:
+        action = request.form.get('action')
+        ids = sorted(set(request.form.getlist('ids', type=int)))
+    if action not in MODERATION_STATUSES and action != 'delete':
+        abort(400)
+    if len(ids) > MAX_BULK_IDS:
+        abort(413)
+
+    count = _moderate(ids, action) if ids else 0
+    if payload is not None:
+        return jsonify({'action': action, 'count': count})
+    flash(f'Обработано материалов: {count}.', 'success')
+    return redirect(url_for('admin_submissions', cursor=request.form.get('cursor') or None))
 
 
 @app.post('/admin/submissions/<int:submission_id>/approve')
 @login_required
 def approve_submission(submission_id):
     _require_admin()
-    submission = Submission.query.get_or_404(submission_id)
-    submission.status = 'approved'
-    db.session.commit()
+    if not _moderate([submission_id], 'approve'):
+        abort(404)
     flash('Материал одобрен.', 'success')
     return redirect(url_for('admin_submissions'))
 
@@ -377,9 +885,8 @@ def approve_submission(submission_id):
 @login_required
 def reject_submission(submission_id):
     _require_admin()
-    submission = Submission.query.get_or_404(submission_id)
-    submission.status = 'rejected'
-    db.session.commit()
+    if not _moderate([submission_id], 'reject'):
+        abort(404)
     flash('Материал отклонён.', 'success')
     return redirect(url_for('admin_submissions'))
 
@@ -388,39 +895,44 @@ def reject_submission(submission_id):
 @login_required
 def delete_submission(submission_id):
     _require_admin()
-    submission = Submission.query.get_or_404(submission_id)
-    _delete_upload(submission.file_path)
-    _delete_upload(submission.video_path)
-    db.session.delete(submission)
-    db.session.commit()
+    if not _moderate([submission_id], 'delete'):
+        abort(404)
     flash('Материал удалён.', 'success')
     return redirect(url_for('admin_submissions'))
 
 
-@app.route('/theory/file/<int:submission_id>')
-def download_submission_file(submission_id):
-    submission = Submission.query.get_or_404(submission_id)
-    if submission.status != 'approved' and (not current_user.is_authenticated or not current_user.is_admin):
+def _send_submission_upload(submission_id, path_column, name_column, as_attachment):
+    submission = (
+        Submission.query.options(load_only(Submission.status, path_column, name_column))
+        .filter_by(id=submission_id)
+        .first_or_404()
+    )
+    is_public = submission.status == 'approved'
+    if not is_public and (not current_user.is_authenticated or not current_user.is_admin):
         abort(403)
-    if not submission.file_path:
+    relative_path = getattr(submission, path_column.key)
+    if not relative_path:
         abort(404)
-    rel_dir = os.path.dirname(submission.file_path)
-    filename = os.path.basename(submission.file_path)
-    directory = os.path.join(UPLOAD_ROOT, rel_dir)
-    return send_from_directory(directory, filename, as_attachment=True)
+    return send_upload(
+        UPLOAD_ROOT,
+        relative_path,
+        mode=app.config['FILE_DELIVERY'],
+        accel_prefix=app.config['FILE_ACCEL_PREFIX'],
+        download_name=getattr(submission, name_column.key),
+        as_attachment=as_attachment,
+        # Pending material seen by an admin must not linger in caches after moderation.
+        max_age=app.config['FILE_CACHE_MAX_AGE'] if is_public else 0,
+    )
+
+
+@app.route('/theory/file/<int:submission_id>')
+def download_submission_file(submission_id):
+    return _send_submission_upload(submission_id, Submission.file_path, Submission.file_name, True)
 
 
 @app.route('/theory/video/<int:submission_id>')
 def stream_submission_video(submission_id):
-    submission = Submission.query.get_or_404(submission_id)
-    if submission.status != 'approved' and (not current_user.is_authenticated or not current_user.is_admin):
-        abort(403)
-    if not submission.video_path:
-        abort(404)
-    rel_dir = os.path.dirname(submission.video_path)
-    filename = os.path.basename(submission.video_path)
-    directory = os.path.join(UPLOAD_ROOT, rel_dir)
-    return send_from_directory(directory, filename, as_attachment=False)
+    return _send_submission_upload(submission_id, Submission.video_path, Submission.video_name, False)
 
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -446,7 +958,11 @@ def register():
         user = User(username=username, email=email)
         if User.query.count() == 0:
             user.is_admin = True
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except HashingBusyError:
+            flash('Сервер перегружен, попробуйте ещё раз через несколько секунд', 'error')
+            return render_template('register.html'), 503
 
         db.session.add(user)
         db.session.commit()
@@ -469,7 +985,19 @@ def login():
 
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except HashingBusyError:
+            flash('Сервер перегружен, попробуйте ещё раз через несколько секунд', 'error')
+            return render_template('login.html'), 503
+
+        if valid:
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except HashingBusyError:
+                    pass  # keep the old hash, retry on a later login
             login_user(user, remember=remember)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('dashboard'))
@@ -498,27 +1026,127 @@ def profile():
     return render_template('profile.html', user=current_user)
 
 
-# Создание таблиц в базе данных
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Apply pending database schema migrations."""
+    applied = upgrade_schema()
+    for description in applied:
+        click.echo(f'Applied: {description}')
+    click.echo(f'Schema is at version {LATEST_VERSION}.')
+
+
+def _worker_process(once):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    with app.app_context():
+        run_worker(stop=stop, once=once, logger=app.logger)
+
+
+@app.cli.command('run-worker')
+@click.option('--processes', default=1, show_default=True, help='Number of worker processes.')
+@click.option('--once', is_flag=True, help='Exit when no job is due instead of polling.')
+def run_worker_command(processes, once):
+    """Process background jobs such as the inspection of new uploads."""
+    stop_background_refresh()
+    if processes <= 1:
+        _worker_process(once)
+        return
+    # Children must not share the parent's database connections.
+    db.engine.dispose()
+    workers = [multiprocessing.Process(target=_worker_process, args=(once,)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    signal.signal(signal.SIGTERM, lambda *_: [worker.terminate() for worker in workers])
+    for worker in workers:
+        worker.join()
+
+
+@app.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove previously built files first.')
+def build_assets_command(clean):
+    """Fingerprint and precompress static files into static/dist."""
+    manifest = build_assets(app.static_folder, clean=clean)
+    asset_manifest.reload()
+    for logical_name, built_name in sorted(manifest.items()):
+        click.echo(f'{logical_name} -> {built_name}')
+
+
+@app.cli.command('reconcile-storage')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed or fixed.')
+@click.option('--schedule', is_flag=True, help='Queue the incremental background reconciler instead.')
+def reconcile_storage_command(dry_run, schedule):
+    """Find orphan upload files and dangling blob rows."""
+    if schedule:
+        queued = schedule_reconciler()
+        click.echo('Reconciler queued.' if queued else 'Reconciler is already queued.')
+        return
+    report = reconcile_all(UPLOAD_ROOT, app.config['RECONCILE_GRACE_SECONDS'], dry_run=dry_run)
+    for sample in report.pop('samples'):
+        click.echo(f'  {sample}')
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+
+
+@app.cli.command('gc-uploads')
+def gc_uploads_command():
+    """Delete resumable upload sessions that were abandoned."""
+    removed = 0
+    while True:
+        batch = _collect_stale_upload_sessions()
+        removed += batch
+        if batch < STALE_SESSION_BATCH:
+            break
+    click.echo(f'Removed {removed} stale upload sessions.')
+
+
+def _seed_persisted_snapshots():
+    """Warm the scraper cache from the last persisted snapshot, so the first
+    requests after a restart do not wait for a scrape."""
+    with app.app_context():
+        for kind in ('news', 'calendar'):
+            snapshot = ScrapedItem.load_snapshot(kind)
+            if snapshot:
+                seed_snapshot(kind, snapshot)
+
+
+# Проверка версии схемы базы данных; сами миграции запускаются командой upgrade-db
 with app.app_context():
-    db.create_all()
-    inspector = inspect(db.engine)
-    if 'user' in inspector.get_table_names():
-        columns = [column['name'] for column in inspector.get_columns('user')]
-        if 'is_admin' not in columns:
-            db.session.execute(text('ALTER TABLE user ADD COLUMN is_admin BOOLEAN DEFAULT 0'))
-            db.session.commit()
-        admin_user = User.query.filter(func.lower(User.username) == 'admin').first()
-        if admin_user and not admin_user.is_admin:
-            admin_user.is_admin = True
-            db.session.commit()
-    if 'submission' in inspector.get_table_names():
-        submission_columns = [column['name'] for column in inspector.get_columns('submission')]
-        if 'title' not in submission_columns:
-            db.session.execute(text("ALTER TABLE submission ADD COLUMN title VARCHAR(200) DEFAULT '' NOT NULL"))
-        if 'description' not in submission_columns:
-            db.session.execute(text('ALTER TABLE submission ADD COLUMN description TEXT'))
-        db.session.commit()
+    if app.config['AUTO_MIGRATE'] or __name__ == '__main__':
+        upgrade_schema()
+    schema_current = schema_is_current()
+
+if not schema_current:
+    app.logger.error('Database schema is outdated, run "flask --app app upgrade-db".')
+    _schema_state = {'current': False, 'checked_at': time.monotonic()}
+
+    @app.before_request
+    def _require_current_schema():
+        # Picks up an upgrade-db run that finishes while this worker is up.
+        if _schema_state['current']:
+            return
+        now = time.monotonic()
+        if now - _schema_state['checked_at'] >= SCHEMA_RECHECK_SECONDS:
+            _schema_state['checked_at'] = now
+            if schema_is_current():
+                _schema_state['current'] = True
+                app.logger.info('Database schema is current, serving requests.')
+                _seed_persisted_snapshots()
+                return
+        abort(503)
+else:
+    _seed_persisted_snapshots()
+
+add_refresh_listener(_persist_scraped_snapshot)
+if app.config['OLYMPIAD_BACKGROUND_REFRESH']:
+
+    @app.before_request
+    def _start_background_refresh():
+        # Started by the first request rather than at import, so CLI commands
+        # and job workers, which import the app too, do not scrape.
+        start_background_refresh()
 
 
 if __name__ == '__main__':
+    # Spawned pool processes would re-run this script as their main module.
+    hasher.configure(app.config['PASSWORD_HASH_METHOD'], workers=0)
     app.run(debug=True)
@@ -0,0 +1,119 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask --app app build-assets`` copies every file under ``static/`` (except
+``dist/`` itself) to ``static/dist/<dir>/<name>.<hash>.<ext>``, writes
+``.gz`` and, when the ``brotli`` package is installed, ``.br`` variants next
+to text assets, and records ``logical name -> fingerprinted name`` in
+``static/dist/manifest.json``.
+
+Templates call ``asset_url('css/style.css')``. With a manifest it points to
+``/assets/<fingerprinted name>``, served with a one-year immutable
+Cache-Control and the best precompressed variant the client accepts. Without
+a manifest (or in debug mode) it falls back to ``url_for('static', ...)``, so a
+checkout works without a build step.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import abort, current_app, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE_EXTS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Preferred order when the client accepts several encodings.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _fingerprinted_name(logical_name, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, ext = os.path.splitext(logical_name)
+    return f'{stem}.{digest}{ext}'
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as out:
+        out.write(content)
+
+
+def build_assets(static_folder, clean=False):
+    """Build ``static/dist`` and its manifest; returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    if clean and os.path.isdir(dist):
+        shutil.rmtree(dist)
+    manifest = {}
+    for directory, subdirs, files in os.walk(static_folder):
+        if os.path.abspath(directory) == os.path.abspath(static_folder) and DIST_DIR in subdirs:
+            subdirs.remove(DIST_DIR)
+        for filename in sorted(files):
+            source = os.path.join(directory, filename)
+            logical_name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                content = handle.read()
+            built_name = _fingerprinted_name(logical_name, content)
+            target = os.path.join(dist, built_name)
+            _write(target, content)
+            if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTS:
+                # Variants that do not save anything are not worth a lookup.
+                compressed = gzip.compress(content, compresslevel=9, mtime=0)
+                if len(compressed) < len(content):
+                    _write(target + '.gz', compressed)
+                if brotli is not None:
+                    compressed = brotli.compress(content, quality=11)
+                    if len(compressed) < len(content):
+                        _write(target + '.br', compressed)
+            manifest[logical_name] = built_name
+    _write(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class AssetManifest:
+    """Resolves logical asset names through ``static/dist/manifest.json``."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.dist = os.path.join(static_folder, DIST_DIR)
+        self.reload()
+
+    def reload(self):
+        try:
+            with open(os.path.join(self.dist, MANIFEST_NAME), encoding='utf-8') as handle:
+                self.files = json.load(handle)
+        except FileNotFoundError:
+            self.files = {}
+        self.built = set(self.files.values())
+
+    def url(self, filename):
+        built_name = self.files.get(filename)
+        if built_name is None or current_app.debug:
+            return url_for('static', filename=filename)
+        return url_for('asset', filename=built_name)
+
+    def send(self, filename):
+        if filename not in self.built:
+            abort(404)
+        path = os.path.join(self.dist, filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for name, suffix in ENCODINGS:
+            if request.accept_encodings[name] and os.path.isfile(path + suffix):
+                encoding, path = name, path + suffix
+                break
+        response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE, conditional=False, etag=False)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
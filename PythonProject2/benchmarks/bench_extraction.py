@@ -0,0 +1,114 @@
+"""Compare the streaming page-facts extractor with the old full-soup path.
+
+Usage:
+    python benchmarks/bench_extraction.py [saved_page.html ...]
+
+Without arguments two synthetic ~2 MB pages are used: one with the title,
+summary and date near the top (the streaming parser stops early) and one
+without any date, which the streaming parser has to read to the end. Pages
+saved from the olympiad sites (``curl -o page.html <url>``) give the most
+realistic numbers.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from olympiad_parser import _extract_date, _extract_facts  # noqa: E402
+
+
+def legacy_extract_facts(html, url):
+    soup = BeautifulSoup(html, "html.parser")
+    title = None
+    for tag in ("h1", "title"):
+        node = soup.find(tag)
+        if node and node.get_text(" ", strip=True):
+            title = node.get_text(" ", strip=True)
+            break
+    if title is None:
+        meta = soup.find("meta", attrs={"property": "og:title"})
+        if meta and meta.get("content"):
+            title = meta["content"].strip()
+    summary = None
+    meta = soup.find("meta", attrs={"name": "description"})
+    if meta and meta.get("content"):
+        summary = meta["content"].strip()
+    else:
+        for paragraph in soup.find_all("p"):
+            text = paragraph.get_text(" ", strip=True)
+            if len(text) >= 60:
+                summary = text
+                break
+    return {
+        "title": title,
+        "summary": summary,
+        "date": _extract_date(soup.get_text(" ", strip=True), url),
+    }
+
+
+def synthetic_page(size_bytes=2 * 1024 * 1024, with_date=True):
+    date = " 15.03.2026" if with_date else ""
+    head = (
+        "<html><head><title>Олимпиада школьников</title>"
+        '<meta name="description" content="Расписание заключительного этапа олимпиады.">'
+        "<style>body { color: #333; }</style></head><body>"
+        "<h1>График проведения заключительного этапа 2025-2026</h1>"
+        f"<p>Заключительный этап пройдёт{date} на площадках университета.</p>"
+    )
+    row = (
+        "<div class='news'><a href='/news/item'>Новость</a>"
+        "<p>Участники получат информацию о рассадке и аудиториях заранее, "
+        "следите за обновлениями в личном кабинете.</p></div>"
+    )
+    rows = [row] * (size_bytes // len(row.encode("utf-8")) + 1)
+    return head + "".join(rows) + "</body></html>"
+
+
+def measure(func, html, url, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html, url)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(html, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="saved HTML pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in args.pages:
+            with open(path, encoding="utf-8", errors="replace") as handle:
+                pages.append((path, handle.read()))
+    else:
+        pages = [
+            ("synthetic, facts up front", synthetic_page()),
+            ("synthetic, no date (full scan)", synthetic_page(with_date=False)),
+        ]
+
+    for name, html in pages:
+        url = "https://example.org/"
+        legacy, legacy_time, legacy_peak = measure(legacy_extract_facts, html, url, args.repeat)
+        streaming, streaming_time, streaming_peak = measure(_extract_facts, html, url, args.repeat)
+        print(f"{name} ({len(html.encode('utf-8')) / 1024:.0f} KiB)")
+        print(f"  soup      {legacy_time * 1000:8.1f} ms  peak {legacy_peak / 1024:8.0f} KiB")
+        print(f"  streaming {streaming_time * 1000:8.1f} ms  peak {streaming_peak / 1024:8.0f} KiB")
+        if legacy != streaming:
+            print(f"  results differ:\n    soup:      {legacy}\n    streaming: {streaming}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Show query plans and timings of the hot Submission/User queries with and without indexes.
+
+Usage:
+    python benchmarks/bench_query_plans.py [--users 5000] [--submissions 50000]
+
+A throwaway SQLite database is created from the models, seeded, and every
+query is explained and timed first without the secondary indexes and then
+with them.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ContentVersion, Submission, User, db  # noqa: E402
+
+QUERIES = {
+    "theory page": (
+        "SELECT submission.id, submission.title, user.username FROM submission "
+        "JOIN user ON user.id = submission.user_id "
+        "WHERE submission.status = 'approved' "
+        "ORDER BY submission.created_at DESC, submission.id DESC LIMIT 21"
+    ),
+    "theory version": (
+        "SELECT version FROM content_version WHERE name = 'submissions'"
+    ),
+    "admin page": (
+        "SELECT submission.id, submission.title, user.username FROM submission "
+        "JOIN user ON user.id = submission.user_id "
+        "ORDER BY submission.created_at DESC, submission.id DESC LIMIT 51"
+    ),
+    "upload list": (
+        "SELECT id, title, status FROM submission WHERE user_id = :user_id "
+        "ORDER BY created_at DESC"
+    ),
+    "register lookup": (
+        "SELECT id FROM user WHERE lower(username) = lower(:username) LIMIT 1"
+    ),
+}
+
+
+def seed(engine, users, submissions):
+    rng = random.Random(42)
+    now = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.org",
+                    "password_hash": "x",
+                    "created_at": now,
+                    "is_admin": False,
+                }
+                for i in range(users)
+            ],
+        )
+        conn.execute(
+            Submission.__table__.insert(),
+            [
+                {
+                    "user_id": rng.randint(1, users),
+                    "title": f"Topic {i}",
+                    "status": rng.choice(["approved", "approved", "pending", "rejected"]),
+                    "created_at": now + timedelta(seconds=i),
+                }
+                for i in range(submissions)
+            ],
+        )
+        conn.execute(ContentVersion.__table__.insert(), {"name": "submissions", "version": submissions})
+        conn.execute(text("ANALYZE"))
+
+
+def report(engine, label, repeat):
+    print(f"== {label}")
+    params = {"user_id": 1, "username": "User4242"}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            elapsed = (time.perf_counter() - start) / repeat
+            print(f"  {name:16} {elapsed * 1000:8.2f} ms")
+            for row in plan:
+                print(f"      {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--submissions", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        db.metadata.create_all(engine, tables=[User.__table__, Submission.__table__, ContentVersion.__table__])
+        indexes = list(User.__table__.indexes) + list(Submission.__table__.indexes)
+        with engine.begin() as conn:
+            for index in indexes:
+                conn.execute(DropIndex(index))
+        seed(engine, args.users, args.submissions)
+        report(engine, "without secondary indexes", args.repeat)
+
+        with engine.begin() as conn:
+            for index in indexes:
+                conn.execute(CreateIndex(index))
+            conn.execute(text("ANALYZE"))
+        report(engine, "with indexes", args.repeat)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
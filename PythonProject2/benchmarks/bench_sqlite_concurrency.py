@@ -0,0 +1,114 @@
+"""Mixed reader/writer load against SQLite with the default and the tuned engine profile.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [--readers 8] [--writers 4] [--seconds 5]
+
+Readers run the theory page query; writers insert submissions (as upload()
+does) and flip statuses (as moderation does). For each profile the script
+prints completed operations and how many failed with "database is locked".
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ENGINE_PROFILES, SQLITE_PRAGMAS  # noqa: E402
+from models import Submission, User, db, install_sqlite_pragmas  # noqa: E402
+
+READ_SQL = text(
+    "SELECT submission.id, submission.title, user.username FROM submission "
+    "JOIN user ON user.id = submission.user_id WHERE submission.status = 'approved' "
+    "ORDER BY submission.created_at DESC, submission.id DESC LIMIT 21"
+)
+INSERT_SQL = text(
+    "INSERT INTO submission (user_id, title, status, created_at) "
+    "VALUES (1, :title, 'pending', :now)"
+)
+UPDATE_SQL = text("UPDATE submission SET status = 'approved' WHERE id = :id")
+
+
+def build_engine(path, tuned):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **ENGINE_PROFILES["sqlite"])
+    install_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    return engine
+
+
+def run(path, tuned, readers, writers, seconds):
+    engine = build_engine(path, tuned)
+    db.metadata.create_all(engine, tables=[User.__table__, Submission.__table__])
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            {"username": "bench", "email": "bench@example.org", "password_hash": "x", "is_admin": False},
+        )
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(READ_SQL).fetchall()
+                bump("reads")
+            except OperationalError:
+                bump("locked")
+
+    def writer():
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    now = datetime.utcnow()
+                    result = conn.execute(INSERT_SQL, {"title": "bench", "now": now})
+                    conn.execute(UPDATE_SQL, {"id": rng.randint(1, result.lastrowid)})
+                bump("writes")
+            except OperationalError:
+                bump("locked")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    for label, tuned in (("default", False), ("tuned sqlite profile", True)):
+        with tempfile.TemporaryDirectory() as directory:
+            counts = run(os.path.join(directory, "bench.db"), tuned, args.readers, args.writers, args.seconds)
+        print(
+            f"{label:22} reads/s {counts['reads'] / args.seconds:8.0f}  "
+            f"writes/s {counts['writes'] / args.seconds:8.0f}  locked errors {counts['locked']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
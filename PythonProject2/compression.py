@@ -0,0 +1,113 @@
+"""On-the-fly gzip for text responses, including streamed ones.
+
+GzipMiddleware compresses the body chunk by chunk as the application yields
+it, flushing the compressor every FLUSH_BYTES of input, so streamed pages keep
+arriving progressively. It leaves alone:
+
+* clients that do not accept gzip and HEAD requests;
+* non-text content types, i.e. media and archives, which are already compressed;
+* responses that already carry a Content-Encoding (precompressed assets);
+* 1xx/204/206/304 responses and anything with a Content-Range;
+* files sent with Accept-Ranges or Content-Disposition (uploads, send_file):
+  gzipping them would drop Content-Length and the sendfile path while byte
+  ranges are still advertised;
+* X-Accel-Redirect / X-Sendfile responses, whose body the proxy supplies;
+* bodies with a known Content-Length below ``min_size``;
+* responses marked ``Cache-Control: no-transform``.
+
+Untouched responses are passed through as-is, so ``wsgi.file_wrapper``
+(sendfile) keeps working for them.
+"""
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/manifest+json',
+    'image/svg+xml',
+)
+SKIP_STATUSES = {204, 206, 304}
+SKIP_HEADERS = (
+    'accept-ranges',
+    'content-disposition',
+    'content-encoding',
+    'content-range',
+    'x-accel-redirect',
+    'x-sendfile',
+)
+FLUSH_BYTES = 8 * 1024
+
+
+def _accepts_gzip(environ):
+    accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+    return accepted['gzip'] > 0 or (accepted['*'] > 0 and accepted.quality('gzip') > 0)
+
+
+class GzipMiddleware:
+    def __init__(self, app, min_size=500, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not _accepts_gzip(environ):
+            return self.app(environ, start_response)
+
+        state = {'compress': False}
+
+        def gzip_start_response(status, headers, exc_info=None):
+            response_headers = Headers(headers)
+            if self._should_compress(int(status.split(' ', 1)[0]), response_headers):
+                state['compress'] = True
+                response_headers.remove('Content-Length')
+                response_headers['Content-Encoding'] = 'gzip'
+                vary = response_headers.get('Vary')
+                response_headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+                # The bytes differ from the uncompressed representation.
+                etag = response_headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    response_headers['ETag'] = f'W/{etag}'
+            return start_response(status, response_headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, gzip_start_response)
+        if not state['compress']:
+            return app_iter
+        return self._compress(app_iter)
+
+    def _should_compress(self, status, headers):
+        if status < 200 or status in SKIP_STATUSES:
+            return False
+        if any(name in headers for name in SKIP_HEADERS):
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        content_type = headers.get('Content-Type', '').lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def _compress(self, app_iter):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        pending = 0
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                data = compressor.compress(chunk)
+                pending += len(chunk)
+                if pending >= FLUSH_BYTES:
+                    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                    pending = 0
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
@@ -1,6 +1,91 @@
 import os
 
+# SQLAlchemy engine options per database kind. "sqlite" is tuned for several
+# worker processes sharing one file; "server" is for PostgreSQL/MySQL.
+ENGINE_PROFILES = {
+    'sqlite': {
+        'connect_args': {'timeout': 30},
+    },
+    'server': {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    },
+}
+
+# Applied to every new SQLite connection (see models.install_sqlite_pragmas).
+SQLITE_PRAGMAS = {
+    # First, so the journal_mode switch below waits for a concurrent writer instead of failing.
+    'busy_timeout': 30000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def _default_engine_profile(database_uri):
+    return 'sqlite' if database_uri.startswith('sqlite') else 'server'
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///database.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE') or _default_engine_profile(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_ENGINE_OPTIONS = ENGINE_PROFILES[DB_ENGINE_PROFILE]
+    SQLITE_PRAGMAS = SQLITE_PRAGMAS
+    # Run pending schema migrations on startup instead of via "flask upgrade-db".
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE') == '1'
+    # Refresh olympiad news/calendar in a background thread instead of on the request path.
+    # The thread starts with the first request a process serves, never in CLI commands.
+    OLYMPIAD_BACKGROUND_REFRESH = (os.environ.get('OLYMPIAD_BACKGROUND_REFRESH') or '1') == '1'
+    # Snapshot store shared by all workers: sqlite:///path, redis://host:port/db or memory://.
+    # Defaults to a SQLite file in the instance folder.
+    SCRAPE_CACHE_URL = os.environ.get('SCRAPE_CACHE_URL')
+    # ETag/Last-Modified validators and extracted page data; defaults to instance/http_cache.
+    SCRAPE_HTTP_CACHE_DIR = os.environ.get('SCRAPE_HTTP_CACHE_DIR')
+    # Upper bound for rendered public pages kept in memory for anonymous visitors.
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES') or 16 * 1024 * 1024)
+    # Logged-in users are loaded from a per-process cache. Changes made in this
+    # process invalidate it immediately; other workers see them within the TTL.
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 4096)
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS') or 60)
+    # Password hashes are computed in a process pool. Logins beyond
+    # PASSWORD_HASH_MAX_PENDING queued hashes are rejected at once with a 503;
+    # PASSWORD_HASH_WORKERS=0 hashes inline. Without PASSWORD_HASH_WORKERS each
+    # process gets cores / APP_PROCESSES hashing processes, where APP_PROCESSES is
+    # the number of app workers per host (gunicorn also reads WEB_CONCURRENCY).
+    # Stored hashes made with another method are re-hashed on the next successful login.
+    APP_PROCESSES = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 0) or None
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS') or 10)
+    # Per-type upload limits, checked while the file is being written.
+    UPLOAD_MAX_FILE_BYTES = int(os.environ.get('UPLOAD_MAX_FILE_BYTES') or 50 * 1024 * 1024)
+    UPLOAD_MAX_VIDEO_BYTES = int(os.environ.get('UPLOAD_MAX_VIDEO_BYTES') or 1024 * 1024 * 1024)
+    # Requests larger than one file plus one video (and the form fields) are refused before parsing.
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_FILE_BYTES + UPLOAD_MAX_VIDEO_BYTES + 1024 * 1024
+    # Resumable upload sessions untouched for this long are deleted with their partial data.
+    UPLOAD_SESSION_TTL_SECONDS = int(os.environ.get('UPLOAD_SESSION_TTL_SECONDS') or 24 * 3600)
+    # Storage reconciler: files and blob rows younger than the grace period are
+    # never touched; one step (one directory shard plus one batch of rows) runs
+    # every RECONCILE_STEP_SECONDS once scheduled with "flask reconcile-storage --schedule".
+    RECONCILE_GRACE_SECONDS = int(os.environ.get('RECONCILE_GRACE_SECONDS') or 3600)
+    RECONCILE_STEP_SECONDS = int(os.environ.get('RECONCILE_STEP_SECONDS') or 60)
+    # Who sends uploaded files: "direct" (the app, with Range support),
+    # "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd). For nginx,
+    # FILE_ACCEL_PREFIX must be an internal location aliased to instance/uploads.
+    FILE_DELIVERY = os.environ.get('FILE_DELIVERY') or 'direct'
+    FILE_ACCEL_PREFIX = os.environ.get('FILE_ACCEL_PREFIX') or '/protected-uploads'
+    # Browser cache lifetime for approved files; revalidated with the ETag afterwards.
+    FILE_CACHE_MAX_AGE = int(os.environ.get('FILE_CACHE_MAX_AGE') or 3600)
+    # Gzip text responses (HTML, JSON, CSS/JS) on the fly, streamed pages included.
+    # Turn off when a reverse proxy already compresses.
+    COMPRESS_RESPONSES = (os.environ.get('COMPRESS_RESPONSES') or '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 500)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
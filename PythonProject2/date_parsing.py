@@ -0,0 +1,140 @@
+import re
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MONTH_KEYWORDS_RU = {
+    "янв": 1,
+    "январ": 1,
+    "фев": 2,
+    "феврал": 2,
+    "мар": 3,
+    "март": 3,
+    "апр": 4,
+    "апрел": 4,
+    "май": 5,
+    "мая": 5,
+    "июн": 6,
+    "июнь": 6,
+    "июня": 6,
+    "июл": 7,
+    "июль": 7,
+    "июля": 7,
+    "авг": 8,
+    "август": 8,
+    "сен": 9,
+    "сент": 9,
+    "сентябр": 9,
+    "окт": 10,
+    "октябр": 10,
+    "ноя": 11,
+    "нояб": 11,
+    "ноябр": 11,
+    "дек": 12,
+    "декабр": 12,
+}
+
+# One alternation so a single scan finds the earliest date in any format:
+# 15.03.2026 / 15-03-26, 2026-03-15, and 15 марта 2026.
+_DATE_RE = re.compile(
+    r"\b(?:"
+    r"(?P<dmy_d>\d{1,2})[./-](?P<dmy_m>\d{1,2})[./-](?P<dmy_y>\d{4}|\d{2})"
+    r"|(?P<ymd_y>20\d{2})[./-](?P<ymd_m>\d{1,2})[./-](?P<ymd_d>\d{1,2})"
+    r"|(?P<word_d>\d{1,2})\s+(?P<word_m>[a-zа-яё]+)\.?\s+(?P<word_y>\d{4})"
+    r")\b",
+    re.IGNORECASE,
+)
+_YEAR_RANGE_RE = re.compile(r"\b(20\d{2})\s*[-–—]\s*(20\d{2})\b")
+_URL_DATE_RE = re.compile(r"/(20\d{2})[/-](\d{1,2})[/-](\d{1,2})")
+
+
+def _build_month_trie(keywords: Dict[str, int]) -> Dict[str, dict]:
+    root: Dict[str, dict] = {}
+    for keyword, month in keywords.items():
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = month
+    return root
+
+
+_MONTH_TRIE = _build_month_trie(MONTH_KEYWORDS_RU)
+
+
+def month_from_word(word: str) -> Optional[int]:
+    """Return the month for the longest known prefix of ``word``, e.g. "марта" -> 3."""
+    node = _MONTH_TRIE
+    month = None
+    for char in word.lower().replace("ё", "е"):
+        node = node.get(char)
+        if node is None:
+            break
+        month = node.get("", month)
+    return month
+
+
+def search_date(text: str) -> Optional[date]:
+    """Return the first valid date found anywhere in ``text``."""
+    if not text:
+        return None
+    for match in _DATE_RE.finditer(text):
+        groups = match.groupdict()
+        if groups["dmy_d"]:
+            year = groups["dmy_y"]
+            if len(year) == 2:
+                year = f"20{year}"
+            parts = (year, groups["dmy_m"], groups["dmy_d"])
+        elif groups["ymd_y"]:
+            parts = (groups["ymd_y"], groups["ymd_m"], groups["ymd_d"])
+        else:
+            month = month_from_word(groups["word_m"])
+            if month is None:
+                continue
+            parts = (groups["word_y"], month, groups["word_d"])
+        try:
+            return date(int(parts[0]), int(parts[1]), int(parts[2]))
+        except ValueError:
+            continue
+    return None
+
+
+def date_from_url(url: str) -> Optional[date]:
+    """Dates embedded in paths such as ``/news/2025/12/25/...``."""
+    match = _URL_DATE_RE.search(url or "")
+    if not match:
+        return None
+    try:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def parse_year_range(text: str) -> Optional[Tuple[int, int]]:
+    """Recognise season labels such as "2025-2026" or "2025–2026"."""
+    match = _YEAR_RANGE_RE.search(text or "")
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+@lru_cache(maxsize=4096)
+def parse_event_date(raw_value) -> Optional[date]:
+    """Parse the ``date`` field of a calendar item.
+
+    A season range ("2025-2026") means the event has no exact date, so it
+    yields ``None`` even when the string also contains a day.
+    """
+    if not raw_value:
+        return None
+    text = str(raw_value).strip().replace("–", "-").replace("—", "-")
+    if not text or parse_year_range(text):
+        return None
+    return search_date(text)
+
+
+def parse_event_dates(values: Iterable) -> List[Optional[date]]:
+    return [parse_event_date(value) if value else None for value in values]
+
+
+def format_date(value: date) -> str:
+    return value.strftime("%d.%m.%Y")
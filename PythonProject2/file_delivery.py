@@ -0,0 +1,129 @@
+"""Serving stored uploads.
+
+FILE_DELIVERY selects who moves the bytes:
+
+* ``x-accel-redirect`` - nginx; the view answers with an empty response and
+  ``X-Accel-Redirect: <FILE_ACCEL_PREFIX>/<relative path>``. nginx needs a
+  matching ``internal`` location aliased to the upload root.
+* ``x-sendfile`` - Apache mod_xsendfile / lighttpd; ``X-Sendfile: <absolute path>``.
+* ``direct`` - the application serves the file itself with ETag, 304 and
+  single-range 206 support. The body is handed to the server's
+  ``wsgi.file_wrapper`` so gunicorn can use ``os.sendfile`` instead of
+  copying the file through Python.
+"""
+import mimetypes
+import os
+import re
+from typing import Optional
+from urllib.parse import quote
+
+from flask import Response, abort, request
+from werkzeug.http import http_date
+from werkzeug.wsgi import wrap_file
+
+DELIVERY_MODES = ('direct', 'x-accel-redirect', 'x-sendfile')
+READ_BUFFER_SIZE = 256 * 1024
+
+_BLOB_NAME = re.compile(r'^[0-9a-f]{64}')
+
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii').replace('"', '') or 'download'
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def _etag_for(path: str, stat: os.stat_result) -> str:
+    # Content-addressed blobs are named after their SHA-256, which is the best validator there is.
+    match = _BLOB_NAME.match(os.path.basename(path))
+    if match:
+        return match.group(0)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(READ_BUFFER_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def send_upload(
+    upload_root: str,
+    relative_path: str,
+    *,
+    mode: str = 'direct',
+    accel_prefix: str = '',
+    download_name: Optional[str] = None,
+    as_attachment: bool = False,
+    max_age: int = 0,
+) -> Response:
+    """Build the response for one stored upload; access checks are the caller's job."""
+    path = os.path.join(upload_root, relative_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        abort(404)
+
+    name = download_name or os.path.basename(path)
+    mimetype = mimetypes.guess_type(name)[0] or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {
+        'Content-Disposition': _content_disposition('attachment' if as_attachment else 'inline', name),
+        'Cache-Control': f'private, max-age={max_age}' if max_age else 'private, no-cache',
+    }
+
+    if mode == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(relative_path.replace(os.sep, '/'))}"
+        return Response(b'', mimetype=mimetype, headers=headers)
+    if mode == 'x-sendfile':
+        headers['X-Sendfile'] = os.path.abspath(path)
+        return Response(b'', mimetype=mimetype, headers=headers)
+
+    size = stat.st_size
+    etag = _etag_for(path, stat)
+    headers['Accept-Ranges'] = 'bytes'
+    headers['ETag'] = f'"{etag}"'
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+
+    if request.if_none_match:
+        # Weak comparison: a gzipped copy comes back as W/"<etag>".
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+    elif request.if_modified_since and int(stat.st_mtime) <= request.if_modified_since.timestamp():
+        return Response(status=304, headers=headers)
+
+    start, stop = 0, size
+    byte_range = request.range
+    if_range = request.if_range
+    range_applies = byte_range is not None and len(byte_range.ranges) == 1 and (
+        if_range.etag is None and if_range.date is None or if_range.etag == etag
+    )
+    if range_applies:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    length = stop - start
+    headers['Content-Length'] = str(length)
+    if stop == size:
+        # Open-ended ranges (what players send while seeking) and full
+        # responses end at EOF, so the server's file wrapper can sendfile()
+        # from the current offset.
+        source = open(path, 'rb')
+        source.seek(start)
+        body = wrap_file(request.environ, source, READ_BUFFER_SIZE)
+    else:
+        body = _read_range(path, start, length)
+    return Response(
+        body,
+        status=206 if range_applies else 200,
+        mimetype=mimetype,
+        headers=headers,
+        direct_passthrough=True,
+    )
@@ -0,0 +1,138 @@
+"""Background jobs stored in the application database.
+
+``enqueue`` only adds a row to the current session, so a job is committed (or
+rolled back) together with the data it refers to. Workers started with
+``flask --app app run-worker`` claim due jobs with a conditional UPDATE, which
+is safe across processes on SQLite as well as on server databases, run the
+registered handler and delete the job in the handler's transaction. A failing
+job is retried with exponential backoff until ``max_attempts``; a job whose
+worker died is picked up again once its lease expires, so handlers must be
+idempotent.
+"""
+import json
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from models import db, Job
+
+LEASE_SECONDS = 15 * 60
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+POLL_INTERVAL_SECONDS = 1.0
+
+# name -> (handler, on_failure)
+HANDLERS = {}
+
+
+def handler(name, on_failure=None):
+    """Register ``func(**payload)`` for jobs called ``name``.
+
+    ``on_failure(**payload)`` runs once the job has used up its attempts.
+    """
+    def register(func):
+        HANDLERS[name] = (func, on_failure)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=5):
+    job = Job(
+        name=name,
+        payload=json.dumps(payload or {}),
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+    db.session.add(job)
+    return job
+
+
+def backoff_seconds(attempts):
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.75, 1.25)
+
+
+def _due(now):
+    return or_(
+        and_(Job.state == 'queued', Job.run_at <= now),
+        and_(Job.state == 'running', Job.locked_until < now),
+    )
+
+
+def claim_next(worker_id):
+    """Lease the oldest due job to ``worker_id``; None when nothing is due."""
+    while True:
+        now = datetime.utcnow()
+        job_id = db.session.execute(
+            select(Job.id).where(_due(now)).order_by(Job.run_at).limit(1)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, _due(now))
+            .values(
+                state='running',
+                attempts=Job.attempts + 1,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=LEASE_SECONDS),
+            )
+        )
+        db.session.commit()
+        if claimed.rowcount:
+            return db.session.get(Job, job_id)
+        # Another worker won the race for this row; look again.
+
+
+def run_job(job):
+    """Run one claimed job; returns True when it succeeded."""
+    job_id, name, payload = job.id, job.name, json.loads(job.payload)
+    func, on_failure = HANDLERS.get(name, (None, None))
+    try:
+        if func is None:
+            raise LookupError(f'No handler registered for job {name!r}')
+        func(**payload)
+        db.session.delete(job)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+
+    job = db.session.get(Job, job_id)
+    job.last_error = error[-4000:]
+    job.locked_by = None
+    job.locked_until = None
+    if job.attempts >= job.max_attempts:
+        job.state = 'failed'
+    else:
+        job.state = 'queued'
+        job.run_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+    db.session.commit()
+    if job.state == 'failed' and on_failure is not None:
+        on_failure(**payload)
+        db.session.commit()
+    return False
+
+
+def run_worker(stop=None, once=False, poll_interval=POLL_INTERVAL_SECONDS, logger=None):
+    """Process jobs until ``stop`` is set (or, with ``once``, until the queue is empty)."""
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    while stop is None or not stop.is_set():
+        job = claim_next(worker_id)
+        if job is None:
+            if once:
+                return
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        if not run_job(job) and logger is not None:
+            logger.warning('Job %s (%s) failed', job.id, job.name)
@@ -0,0 +1,294 @@
+"""Versioned schema migrations.
+
+The schema version is stored in the ``schema_version`` table. Worker startup
+only reads that one row (``schema_is_current``); the actual upgrade runs
+from ``flask --app app upgrade-db`` (or automatically with AUTO_MIGRATE=1).
+
+To change the schema, append a ``(version, description, function)`` entry to
+``MIGRATIONS``. A migration receives an open connection and runs inside the
+same transaction that records its version. Migrations spell out the tables
+and indexes as they were when the version was written rather than reading the
+current models, and compile their DDL for the connection's dialect.
+
+Concurrent upgraders (several workers starting with AUTO_MIGRATE=1) are
+serialised: each step takes the database write lock (SQLite) or an advisory
+lock (PostgreSQL, MySQL) before it reads the version, so only the first one
+applies a migration and the others see the new version once it commits.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    false,
+    func,
+    inspect,
+    text,
+    update,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable, DropIndex
+
+from models import db
+from search_index import create_index as create_search_index
+
+def _columns(connection, table_name):
+    return {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+
+def _indexes(connection, table_name):
+    return {index['name'] for index in inspect(connection).get_indexes(table_name)}
+
+
+def _metadata():
+    """A fresh MetaData with the user.id key that historical tables reference."""
+    metadata = MetaData()
+    Table('user', metadata, Column('id', Integer, primary_key=True))
+    return metadata
+
+
+def _create_table(connection, table):
+    connection.execute(CreateTable(table, if_not_exists=True))
+    for index in table.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _add_column(connection, table_name, column):
+    if column.name in _columns(connection, table_name):
+        return
+    table = connection.dialect.identifier_preparer.quote(table_name)
+    column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column_ddl}'))
+
+
+def _legacy_columns(connection):
+    submission = Table(
+        'submission',
+        _metadata(),
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('title', String(200), nullable=False),
+        Column('description', Text),
+        Column('file_name', String(255)),
+        Column('file_path', String(255)),
+        Column('video_name', String(255)),
+        Column('video_path', String(255)),
+        Column('status', String(20)),
+        Column('created_at', DateTime),
+    )
+    _create_table(connection, submission)
+    _add_column(connection, 'user', Column('is_admin', Boolean, server_default=false()))
+    user = Table('user', MetaData(), Column('username', String(80)), Column('is_admin', Boolean))
+    connection.execute(update(user).where(func.lower(user.c.username) == 'admin').values(is_admin=True))
+    _add_column(connection, 'submission', Column('title', String(200), nullable=False, server_default=''))
+    _add_column(connection, 'submission', Column('description', Text))
+
+
+def _scraped_item_table(connection):
+    scraped_item = Table(
+        'scraped_item',
+        _metadata(),
+        Column('id', Integer, primary_key=True),
+        Column('kind', String(20), nullable=False),
+        Column('source_url', String(500), nullable=False),
+        Column('position', Integer, nullable=False),
+        Column('content_hash', String(64), nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('fetched_at', DateTime),
+        Column('changed_at', DateTime),
+        UniqueConstraint('kind', 'source_url', name='uq_scraped_item_kind_source'),
+    )
+    _create_table(connection, scraped_item)
+
+
+def _submission_updated_at(connection):
+    _add_column(connection, 'submission', Column('updated_at', DateTime))
+
+
+def _secondary_indexes(connection):
+    user = Table('user', MetaData(), Column('username', String(80)))
+    submission = Table(
+        'submission',
+        MetaData(),
+        *(Column(name) for name in ('id', 'user_id', 'status', 'created_at', 'updated_at')),
+    )
+    c = submission.c
+    indexes = [
+        Index('ix_user_username_lower', func.lower(user.c.username)),
+        Index('ix_submission_status_created_at', c.status, c.created_at, c.id),
+        Index('ix_submission_created_at_id', c.created_at, c.id),
+        Index('ix_submission_user_id_created_at', c.user_id, c.created_at),
+        Index('ix_submission_status_updated_at', c.status, c.updated_at),
+    ]
+    for index in indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _stored_blob_table(connection):
+    stored_blob = Table(
+        'stored_blob',
+        _metadata(),
+        Column('sha256', String(64), primary_key=True),
+        Column('path', String(255), unique=True, nullable=False),
+        Column('size', BigInteger, nullable=False),
+        Column('ref_count', Integer, nullable=False),
+        Column('created_at', DateTime),
+    )
+    _create_table(connection, stored_blob)
+
+
+def _upload_session_table(connection):
+    upload_session = Table(
+        'upload_session',
+        _metadata(),
+        Column('id', String(32), primary_key=True),
+        Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('kind', String(10), nullable=False),
+        Column('filename', String(255), nullable=False),
+        Column('length', BigInteger, nullable=False),
+        Column('received', BigInteger, nullable=False),
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime, index=True),
+    )
+    _create_table(connection, upload_session)
+
+
+def _job_queue(connection):
+    job = Table(
+        'job',
+        _metadata(),
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('state', String(20), nullable=False),
+        Column('attempts', Integer, nullable=False),
+        Column('max_attempts', Integer, nullable=False),
+        Column('run_at', DateTime, nullable=False),
+        Column('locked_by', String(64)),
+        Column('locked_until', DateTime),
+        Column('last_error', Text),
+        Column('created_at', DateTime),
+        Index('ix_job_state_run_at', 'state', 'run_at'),
+    )
+    _create_table(connection, job)
+    _add_column(connection, 'submission', Column('processing_state', String(20)))
+    _add_column(connection, 'submission', Column('file_meta', Text))
+
+
+def _submission_search_index(connection):
+    create_search_index(connection)
+
+
+def _content_version_table(connection):
+    content_version = Table(
+        'content_version',
+        _metadata(),
+        Column('name', String(50), primary_key=True),
+        Column('version', Integer, nullable=False),
+    )
+    _create_table(connection, content_version)
+
+
+def _drop_submission_updated_at(connection):
+    # Nothing reads submission.updated_at since the theory page cache keys on content_version.
+    submission = Table('submission', MetaData(), Column('status'), Column('updated_at'))
+    index = Index('ix_submission_status_updated_at', submission.c.status, submission.c.updated_at)
+    if index.name in _indexes(connection, 'submission'):
+        connection.execute(DropIndex(index))
+    if 'updated_at' in _columns(connection, 'submission'):
+        connection.execute(text('ALTER TABLE submission DROP COLUMN updated_at'))
+
+
+MIGRATIONS = [
+    (1, 'submission table, user.is_admin, submission.title/description', _legacy_columns),
+    (2, 'scraped_item table', _scraped_item_table),
+    (3, 'submission.updated_at', _submission_updated_at),
+    (4, 'submission and user secondary indexes', _secondary_indexes),
+    (5, 'stored_blob table', _stored_blob_table),
+    (6, 'upload_session table', _upload_session_table),
+    (7, 'job table, submission.processing_state/file_meta', _job_queue),
+    (8, 'submission full-text search index', _submission_search_index),
+    (9, 'content_version table', _content_version_table),
+    (10, 'drop submission.updated_at and its index', _drop_submission_updated_at),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+LOCK_NAME = 'schema_migrations'
+LOCK_KEY = 0x5C4E4D41
+
+# Schema objects the models do not describe (virtual tables); a fresh database
+# gets them from these functions in addition to create_all().
+EXTRA_SCHEMA = [_submission_search_index]
+
+
+def current_version(connection):
+    try:
+        return connection.execute(text('SELECT version FROM schema_version')).scalar() or 0
+    except DBAPIError:
+        connection.rollback()
+        return 0
+
+
+@contextmanager
+def _migration_lock():
+    """A connection in a transaction that holds the migration lock until it commits."""
+    with db.engine.connect() as connection:
+        dialect = connection.dialect.name
+        if dialect == 'sqlite':
+            # pysqlite does not open a transaction before DDL; take the write lock explicitly.
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        elif dialect == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': LOCK_KEY})
+        elif dialect in ('mysql', 'mariadb'):
+            # MySQL commits DDL implicitly, so the lock belongs to the session.
+            connection.execute(text('SELECT GET_LOCK(:name, -1)'), {'name': LOCK_NAME})
+        try:
+            yield connection
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            if dialect in ('mysql', 'mariadb'):
+                connection.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': LOCK_NAME})
+
+
+def schema_is_current():
+    with db.engine.connect() as connection:
+        return current_version(connection) >= LATEST_VERSION
+
+
+def upgrade_schema():
+    """Bring the database to LATEST_VERSION; returns the descriptions of applied migrations."""
+    with _migration_lock() as connection:
+        fresh = not inspect(connection).has_table('user')
+        connection.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        if connection.execute(text('SELECT count(*) FROM schema_version')).scalar() == 0:
+            connection.execute(text('INSERT INTO schema_version (version) VALUES (0)'))
+        if fresh:
+            # An empty database gets the current models directly.
+            db.metadata.create_all(connection)
+            for create in EXTRA_SCHEMA:
+                create(connection)
+            connection.execute(text('UPDATE schema_version SET version = :v'), {'v': LATEST_VERSION})
+            return ['create schema']
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with _migration_lock() as connection:
+            # Another process may have applied it while this one waited for the lock.
+            if current_version(connection) >= version:
+                continue
+            migrate(connection)
+            connection.execute(text('UPDATE schema_version SET version = :v'), {'v': version})
+        applied.append(description)
+    return applied
@@ -1,11 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timezone
+import hashlib
+import json
+from collections import Counter
+
+from password_hashing import hasher
 
 db = SQLAlchemy()
 
 
+def install_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA name=value`` for each pragma on every new connection of ``engine``."""
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -15,15 +32,22 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
 
 
+# Case-insensitive username lookups in register() use this expression index.
+db.Index('ix_user_username_lower', func.lower(User.username))
+
+
 class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -36,6 +60,208 @@ class Submission(db.Model):
     video_path = db.Column(db.String(255))
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set by the process_submission job: pending -> ready | failed. NULL for older uploads.
+    processing_state = db.Column(db.String(20))
+    file_meta = db.Column(db.Text)
+
+    __table_args__ = (
+        # Public/admin lists: filter by status (or not at all) and page by (created_at, id).
+        db.Index('ix_submission_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_submission_created_at_id', 'created_at', 'id'),
+        # upload(): a user's own submissions, newest first.
+        db.Index('ix_submission_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    @property
+    def meta(self):
+        return json.loads(self.file_meta) if self.file_meta else {}
 
     def __repr__(self):
         return f'<Submission {self.id} {self.status}>'
+
+
+class StoredBlob(db.Model):
+    """An uploaded file stored once under its SHA-256, shared by every submission that references it."""
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def add_reference(cls, sha256, path, size):
+        """Count one more reference to the blob, registering it under ``path`` if it is new.
+
+        Returns the path the blob is actually stored at. The counter is changed
+        with a single UPDATE so concurrent uploads of the same file never lose
+        an increment.
+        """
+        bumped = db.session.execute(
+            update(cls).where(cls.sha256 == sha256).values(ref_count=cls.ref_count + 1)
+        )
+        if not bumped.rowcount:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(sha256=sha256, path=path, size=size, ref_count=1))
+            except IntegrityError:
+                # Another worker registered the same content first.
+                return cls.add_reference(sha256, path, size)
+        return db.session.execute(select(cls.path).where(cls.sha256 == sha256)).scalar_one()
+
+    @classmethod
+    def drop_references(cls, paths):
+        """Forget one reference per occurrence in ``paths``; returns the paths whose files can go.
+
+        Paths without a blob row (uploads made before deduplication) are owned
+        by a single submission and are always returned.
+        """
+        counts = Counter(path for path in paths if path)
+        if not counts:
+            return set()
+        table = cls.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.path == bindparam('blob_path'))
+            .values(ref_count=table.c.ref_count - bindparam('dropped')),
+            [{'blob_path': path, 'dropped': count} for path, count in counts.items()],
+        )
+        rows = db.session.execute(select(cls.path, cls.ref_count).where(cls.path.in_(counts))).all()
+        released = {row.path for row in rows if row.ref_count <= 0}
+        if released:
+            db.session.execute(delete(cls).where(cls.path.in_(released)))
+        return released | (set(counts) - {row.path for row in rows})
+
+    def __repr__(self):
+        return f'<StoredBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
+class ContentVersion(db.Model):
+    """A counter bumped whenever the data behind a cached page changes.
+
+    Reading it is a primary-key lookup, so it is a cheap cache key even for
+    pages served from the cache.
+    """
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, name):
+        """Increment ``name`` inside the caller's transaction."""
+        bumped = db.session.execute(update(cls).where(cls.name == name).values(version=cls.version + 1))
+        if not bumped.rowcount:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(name=name, version=1))
+            except IntegrityError:
+                cls.bump(name)
+
+    @classmethod
+    def current(cls, name):
+        return db.session.execute(select(cls.version).where(cls.name == name)).scalar() or 0
+
+
+class UploadSession(db.Model):
+    """A resumable upload in progress; received bytes are kept in uploads/tmp/<id>.upload."""
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    length = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    @property
+    def is_complete(self):
+        return self.received >= self.length
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.received}/{self.length}>'
+
+
+class Job(db.Model):
+    """A unit of background work; see jobs.py for the queue semantics."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    state = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Workers pick the oldest due job of a state.
+        db.Index('ix_job_state_run_at', 'state', 'run_at'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.state}>'
+
+
+class ScrapedItem(db.Model):
+    """Last scraped news/calendar entry per source, used to warm the cache on boot."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    source_url = db.Column(db.String(500), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    content_hash = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'source_url', name='uq_scraped_item_kind_source'),)
+
+    @staticmethod
+    def _source_url(item):
+        return item.get('source') or item.get('link') or ''
+
+    @classmethod
+    def store_snapshot(cls, kind, items, fetched_ts):
+        """Upsert a snapshot; rows whose content hash is unchanged only get a new fetched_at."""
+        fetched_at = datetime.fromtimestamp(fetched_ts, timezone.utc).replace(tzinfo=None)
+        existing = {row.source_url: row for row in cls.query.filter_by(kind=kind)}
+        seen = set()
+        for position, item in enumerate(items):
+            source_url = cls._source_url(item)
+            if source_url in seen:
+                continue
+            seen.add(source_url)
+            payload = json.dumps(item, ensure_ascii=False, sort_keys=True)
+            content_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+            row = existing.get(source_url)
+            if row is None:
+                row = cls(kind=kind, source_url=source_url, changed_at=fetched_at)
+                db.session.add(row)
+            if row.content_hash != content_hash:
+                row.content_hash = content_hash
+                row.payload = payload
+                row.changed_at = fetched_at
+            row.position = position
+            row.fetched_at = fetched_at
+        for source_url, row in existing.items():
+            if source_url not in seen:
+                db.session.delete(row)
+        db.session.commit()
+
+    @classmethod
+    def load_snapshot(cls, kind):
+        rows = cls.query.filter_by(kind=kind).order_by(cls.position).all()
+        if not rows:
+            return None
+        fetched_at = min(row.fetched_at for row in rows)
+        return {
+            'ts': fetched_at.replace(tzinfo=timezone.utc).timestamp(),
+            'items': [json.loads(row.payload) for row in rows],
+        }
+
+    def __repr__(self):
+        return f'<ScrapedItem {self.kind} {self.source_url}>'
@@ -1,17 +1,41 @@
-import re
+import hashlib
+import os
+import threading
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from date_parsing import date_from_url, format_date, search_date
+from scrape_cache import PageCache
 
 USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
     "Chrome/120.0 Safari/537.36"
 )
+CONNECT_TIMEOUT_SECONDS = 5
 REQUEST_TIMEOUT_SECONDS = 15
+# Sources are fetched in parallel; whatever has not finished within the
+# budget is reported as unavailable for this refresh.
+REFRESH_BUDGET_SECONDS = 20
+MAX_FETCH_WORKERS = 8
+SUMMARY_MIN_LENGTH = 60
+PARSE_CHUNK_SIZE = 16 * 1024
 CACHE_TTL_SECONDS = 60 * 60
+# The background refresher rebuilds a snapshot this long before it expires,
+# so request handlers never see an expired cache.
+REFRESH_AHEAD_SECONDS = 5 * 60
+REFRESH_POLL_SECONDS = 30
+# A snapshot in which any source failed is rebuilt sooner than a healthy one.
+FAILURE_TTL_SECONDS = 5 * 60
+# Circuit breaker: after a failure a source is skipped for a delay that
+# doubles with every consecutive failure, up to the maximum.
+BREAKER_BASE_DELAY_SECONDS = 60
+BREAKER_MAX_DELAY_SECONDS = 60 * 60
 
 NEWS_SOURCES = [
     {
@@ -71,6 +95,19 @@ _CACHE: Dict[str, Dict[str, object]] = {
     "news": {"ts": 0.0, "items": []},
     "calendar": {"ts": 0.0, "items": []},
 }
+_REFRESH_LOCKS: Dict[str, threading.Lock] = {kind: threading.Lock() for kind in _CACHE}
+# "pid" is the process that owns the thread; a fork() inherits the entry but not the thread.
+_REFRESHER: Dict[str, Optional[object]] = {"thread": None, "stop": None, "pid": None}
+_REFRESHER_LOCK = threading.Lock()
+_FETCH_STATE: Dict[str, Any] = {"pid": None, "pool": None, "session": None}
+_FETCH_STATE_LOCK = threading.Lock()
+# Optional cross-process store (see scrape_cache); _CACHE stays a per-process mirror of it.
+_SHARED: Dict[str, Any] = {"backend": None, "pages": PageCache()}
+_REFRESH_LISTENERS: List[Callable[[str, Dict[str, Any]], None]] = []
+_SOURCE_HEALTH: Dict[str, Dict[str, float]] = {}
+_SOURCE_HEALTH_LOCK = threading.Lock()
+
+Builder = Callable[[], Tuple[List[Dict[str, str]], bool]]
 
 
 def fetch_olympiad_news() -> List[Dict[str, str]]:
@@ -81,126 +118,487 @@ def fetch_olympiad_calendar() -> List[Dict[str, str]]:
     return _fetch_cached("calendar", _build_calendar)
 
 
-def _fetch_cached(kind: str, builder) -> List[Dict[str, str]]:
-    now = time.time()
+def snapshot_version(kind: str) -> float:
+    """Timestamp of the snapshot currently served for ``kind``; changes on every refresh."""
+    return _CACHE[kind]["ts"]
+
+
+def configure_cache(backend) -> None:
+    _SHARED["backend"] = backend
+
+
+def configure_page_cache(pages: PageCache) -> None:
+    _SHARED["pages"] = pages
+
+
+def add_refresh_listener(listener: Callable[[str, Dict[str, Any]], None]) -> None:
+    """Call ``listener(kind, snapshot)`` after this process rebuilds a snapshot."""
+    _REFRESH_LISTENERS.append(listener)
+
+
+def seed_snapshot(kind: str, snapshot: Dict[str, Any]) -> None:
+    """Install a previously persisted snapshot unless a newer one is already loaded."""
+    if snapshot["items"] and snapshot["ts"] > _CACHE[kind]["ts"]:
+        _CACHE[kind] = snapshot
+
+
+def _reset_after_fork() -> None:
+    # A lock held by a parent thread at fork() time stays held in the child
+    # forever, and the parent's fetch pool has no threads here.
+    global _REFRESHER_LOCK, _FETCH_STATE_LOCK, _SOURCE_HEALTH_LOCK
+    for kind in _REFRESH_LOCKS:
+        _REFRESH_LOCKS[kind] = threading.Lock()
+    _REFRESHER_LOCK = threading.Lock()
+    _FETCH_STATE_LOCK = threading.Lock()
+    _SOURCE_HEALTH_LOCK = threading.Lock()
+    _FETCH_STATE.update(pid=None, pool=None, session=None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _refresher_running() -> bool:
+    return _REFRESHER["thread"] is not None and _REFRESHER["pid"] == os.getpid()
+
+
+def start_background_refresh() -> None:
+    if _refresher_running():
+        return
+    with _REFRESHER_LOCK:
+        if _refresher_running():
+            return
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_refresh_loop,
+            args=(stop,),
+            name="olympiad-refresher",
+            daemon=True,
+        )
+        _REFRESHER["stop"] = stop
+        _REFRESHER["thread"] = thread
+        _REFRESHER["pid"] = os.getpid()
+        thread.start()
+
+
+def stop_background_refresh(timeout: Optional[float] = None) -> None:
+    with _REFRESHER_LOCK:
+        thread, stop = _REFRESHER["thread"], _REFRESHER["stop"]
+        if thread is None:
+            return
+        if _REFRESHER["pid"] == os.getpid():
+            stop.set()
+            thread.join(timeout)
+        _REFRESHER["thread"] = None
+        _REFRESHER["stop"] = None
+        _REFRESHER["pid"] = None
+
+
+def _fetch_cached(kind: str, builder: Builder) -> List[Dict[str, str]]:
+    if _REFRESHER["thread"] is not None and not _refresher_running():
+        # Forked after the refresher started (gunicorn --preload): the thread
+        # did not survive the fork, so this process starts its own.
+        start_background_refresh()
+
+    if _is_fresh(kind):
+        return list(_CACHE[kind]["items"])
+
+    if _REFRESHER["thread"] is not None:
+        # Scheduler mode: serve whatever snapshot we have and let the
+        # background worker do the network work.
+        return list(_CACHE[kind]["items"])
+
+    if not _refresh(kind, builder) and not _CACHE[kind]["items"]:
+        # Another worker holds the rebuild lease; wait for its snapshot
+        # instead of scraping the same sources again.
+        deadline = time.time() + REFRESH_BUDGET_SECONDS + REQUEST_TIMEOUT_SECONDS
+        while time.time() < deadline and not _is_fresh(kind):
+            time.sleep(0.25)
+    return list(_CACHE[kind]["items"])
+
+
+def _refresh_due(bucket: Dict[str, Any], ahead: bool = False) -> float:
+    ttl = bucket.get("ttl", CACHE_TTL_SECONDS)
+    if ahead:
+        ttl -= min(REFRESH_AHEAD_SECONDS, ttl / 2)
+    return bucket["ts"] + ttl
+
+
+def _is_fresh(kind: str, ahead: bool = False) -> bool:
     bucket = _CACHE[kind]
-    items = bucket["items"]
-    if items and now - bucket["ts"] < CACHE_TTL_SECONDS:
-        return list(items)
+    if bucket["items"] and time.time() < _refresh_due(bucket, ahead):
+        return True
+    shared = _shared_get(kind)
+    if shared and shared["ts"] > bucket["ts"]:
+        _CACHE[kind] = bucket = shared
+    return bool(bucket["items"]) and time.time() < _refresh_due(bucket, ahead)
 
-    items = builder()
-    bucket["items"] = items
-    bucket["ts"] = now
-    return list(items)
 
+def _shared_get(kind: str) -> Optional[Dict[str, Any]]:
+    backend = _SHARED["backend"]
+    if backend is None:
+        return None
+    try:
+        return backend.get(kind)
+    except Exception:
+        return None
 
-def _build_news() -> List[Dict[str, str]]:
-    items: List[Dict[str, str]] = []
-    with requests.Session() as session:
-        session.headers.update({"User-Agent": USER_AGENT})
-        for source in NEWS_SOURCES:
+
+def _build_snapshot(kind: str, builder: Builder) -> Dict[str, Any]:
+    items, degraded = builder()
+    ttl = FAILURE_TTL_SECONDS if degraded else CACHE_TTL_SECONDS
+    snapshot = {"ts": time.time(), "items": items, "ttl": ttl}
+    for listener in _REFRESH_LISTENERS:
+        try:
+            listener(kind, snapshot)
+        except Exception:
+            pass
+    return snapshot
+
+
+def _refresh(kind: str, builder: Builder, ahead: bool = False, blocking: bool = True) -> bool:
+    lock = _REFRESH_LOCKS[kind]
+    if not lock.acquire(blocking=blocking):
+        return False
+    try:
+        # Another thread or worker may have refreshed while we were waiting.
+        if _is_fresh(kind, ahead):
+            return True
+        backend = _SHARED["backend"]
+        if backend is None:
+            _CACHE[kind] = _build_snapshot(kind, builder)
+            return True
+
+        lease_ttl = REFRESH_BUDGET_SECONDS + REQUEST_TIMEOUT_SECONDS
+        try:
+            token = backend.acquire(kind, lease_ttl)
+        except Exception:
+            # The shared store is unavailable: fall back to a local rebuild.
+            _CACHE[kind] = _build_snapshot(kind, builder)
+            return True
+        if token is None:
+            return False
+        try:
+            if _is_fresh(kind, ahead):
+                return True
+            snapshot = _build_snapshot(kind, builder)
+            _CACHE[kind] = snapshot
             try:
-                html = _fetch_html(session, source["url"])
-                soup = BeautifulSoup(html, "html.parser")
-                text = soup.get_text(" ", strip=True)
-                title = _extract_title(soup) or source["label"]
-                summary = _extract_summary(soup)
-                date_text = _extract_date(text, source["url"]) or "2025-2026"
-                items.append(
-                    {
-                        "title": title,
-                        "subject": source["label"],
-                        "date": date_text,
-                        "summary": summary or "See the source for details.",
-                        "source": source["url"],
-                    }
-                )
-            except requests.RequestException:
-                items.append(
-                    {
-                        "title": "Update not available",
-                        "subject": source["label"],
-                        "date": "2025-2026",
-                        "summary": "See the source for details.",
-                        "source": source["url"],
-                    }
-                )
-    return items
-
-
-def _build_calendar() -> List[Dict[str, str]]:
-    items: List[Dict[str, str]] = []
-    with requests.Session() as session:
-        session.headers.update({"User-Agent": USER_AGENT})
-        for source in CALENDAR_SOURCES:
+                backend.set(kind, snapshot)
+            except Exception:
+                pass
+            return True
+        finally:
+            try:
+                backend.release(kind, token)
+            except Exception:
+                pass
+    finally:
+        lock.release()
+
+
+def _refresh_loop(stop: threading.Event) -> None:
+    builders = {"news": _build_news, "calendar": _build_calendar}
+    while not stop.is_set():
+        delay = REFRESH_POLL_SECONDS
+        for kind, builder in builders.items():
+            if stop.is_set():
+                return
             try:
-                html = _fetch_html(session, source["link"])
-                soup = BeautifulSoup(html, "html.parser")
-                text = soup.get_text(" ", strip=True)
-                date_text = _extract_date(text, source["link"]) or "2025-2026"
-            except requests.RequestException:
-                date_text = "2025-2026"
+                _refresh(kind, builder, ahead=True, blocking=False)
+            except Exception:
+                # Keep serving the previous snapshot; retry on the next poll.
+                continue
+            delay = min(delay, _refresh_due(_CACHE[kind], ahead=True) - time.time())
+        stop.wait(max(1.0, delay))
+
 
+def _build_news() -> Tuple[List[Dict[str, str]], bool]:
+    results = _fetch_all_facts([source["url"] for source in NEWS_SOURCES])
+    items: List[Dict[str, str]] = []
+    degraded = False
+    for source in NEWS_SOURCES:
+        facts = results.get(source["url"])
+        if facts is None:
+            degraded = True
+            facts = _last_good_facts(source["url"])
+        if facts is None:
             items.append(
                 {
-                    "name": source["name"],
-                    "subject": source["subject"],
-                    "stage": source["stage"],
-                    "date": date_text,
-                    "format": source["format"],
-                    "link": source["link"],
+                    "title": "Update not available",
+                    "subject": source["label"],
+                    "date": "2025-2026",
+                    "summary": "See the source for details.",
+                    "source": source["url"],
                 }
             )
-    return items
+            continue
+        items.append(
+            {
+                "title": facts["title"] or source["label"],
+                "subject": source["label"],
+                "date": facts["date"] or "2025-2026",
+                "summary": facts["summary"] or "See the source for details.",
+                "source": source["url"],
+            }
+        )
+    return items, degraded
+
+
+def _build_calendar() -> Tuple[List[Dict[str, str]], bool]:
+    results = _fetch_all_facts([source["link"] for source in CALENDAR_SOURCES])
+    items: List[Dict[str, str]] = []
+    degraded = False
+    for source in CALENDAR_SOURCES:
+        facts = results.get(source["link"])
+        if facts is None:
+            degraded = True
+            facts = _last_good_facts(source["link"])
+        items.append(
+            {
+                "name": source["name"],
+                "subject": source["subject"],
+                "stage": source["stage"],
+                "date": (facts and facts["date"]) or "2025-2026",
+                "format": source["format"],
+                "link": source["link"],
+            }
+        )
+    return items, degraded
+
+
+def _fetch_source_facts(
+    session: requests.Session, url: str, deadline: float
+) -> Optional[Dict[str, Optional[str]]]:
+    if _circuit_open(url):
+        return None
+    try:
+        facts = _fetch_page_facts(session, url)
+    except requests.RequestException:
+        _record_failure(url)
+        return None
+    # A fetch that outlived the refresh budget was already counted as a failure.
+    if time.time() <= deadline:
+        _record_success(url)
+    return facts
+
+
+def _last_good_facts(url: str) -> Optional[Dict[str, Optional[str]]]:
+    entry = _SHARED["pages"].get(url)
+    return entry["facts"] if entry else None
+
+
+def _circuit_open(url: str) -> bool:
+    with _SOURCE_HEALTH_LOCK:
+        health = _SOURCE_HEALTH.get(url)
+        return bool(health) and health["retry_at"] > time.time()
+
+
+def _record_failure(url: str) -> None:
+    with _SOURCE_HEALTH_LOCK:
+        health = _SOURCE_HEALTH.setdefault(url, {"failures": 0, "retry_at": 0.0})
+        health["failures"] += 1
+        delay = BREAKER_BASE_DELAY_SECONDS * 2 ** (health["failures"] - 1)
+        health["retry_at"] = time.time() + min(delay, BREAKER_MAX_DELAY_SECONDS)
+
+
+def _record_success(url: str) -> None:
+    with _SOURCE_HEALTH_LOCK:
+        _SOURCE_HEALTH.pop(url, None)
+
+
+def _fetch_all_facts(urls: List[str]) -> Dict[str, Any]:
+    pool, session = _fetch_resources()
+    deadline = time.time() + REFRESH_BUDGET_SECONDS
+    futures = {pool.submit(_fetch_source_facts, session, url, deadline): url for url in set(urls)}
+    done, not_done = wait(futures, timeout=REFRESH_BUDGET_SECONDS)
+    for future in not_done:
+        future.cancel()
+        # A host that hangs past the budget backs off like one that errors.
+        _record_failure(futures[future])
+    return {futures[future]: future.result() for future in done}
+
+
+def _fetch_resources():
+    # Pool and session are per process: neither survives a fork.
+    with _FETCH_STATE_LOCK:
+        if _FETCH_STATE["pid"] != os.getpid():
+            session = requests.Session()
+            session.headers.update({"User-Agent": USER_AGENT})
+            adapter = HTTPAdapter(pool_connections=MAX_FETCH_WORKERS, pool_maxsize=MAX_FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _FETCH_STATE["session"] = session
+            _FETCH_STATE["pool"] = ThreadPoolExecutor(
+                max_workers=MAX_FETCH_WORKERS,
+                thread_name_prefix="olympiad-fetch",
+            )
+            _FETCH_STATE["pid"] = os.getpid()
+        return _FETCH_STATE["pool"], _FETCH_STATE["session"]
+
 
+def _fetch_page_facts(session: requests.Session, url: str) -> Dict[str, Optional[str]]:
+    pages: PageCache = _SHARED["pages"]
+    entry = pages.get(url)
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
 
-def _fetch_html(session: requests.Session, url: str) -> str:
-    response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
+    response = session.get(
+        url,
+        headers=headers,
+        timeout=(CONNECT_TIMEOUT_SECONDS, REQUEST_TIMEOUT_SECONDS),
+    )
+    if response.status_code == 304 and entry:
+        return entry["facts"]
     response.raise_for_status()
-    return response.text
 
+    # Many servers ignore validators, so an identical body also skips parsing.
+    digest = hashlib.sha256(response.content).hexdigest()
+    if entry and entry["hash"] == digest:
+        facts = entry["facts"]
+    else:
+        facts = _extract_facts(response.text, url)
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if (
+        not entry
+        or entry["hash"] != digest
+        or entry.get("etag") != etag
+        or entry.get("last_modified") != last_modified
+    ):
+        pages.set(
+            url,
+            {"etag": etag, "last_modified": last_modified, "hash": digest, "facts": facts},
+        )
+    return facts
+
+
+def _extract_facts(html: str, url: str) -> Dict[str, Optional[str]]:
+    parser = _PageFactsParser()
+    try:
+        for offset in range(0, len(html), PARSE_CHUNK_SIZE):
+            parser.feed(html[offset:offset + PARSE_CHUNK_SIZE])
+        parser.close()
+    except _FactsComplete:
+        pass
+    return {
+        "title": parser.h1 or parser.title or parser.og_title,
+        "summary": parser.description or parser.paragraph,
+        "date": parser.date or _extract_date("", url),
+    }
+
+
+class _FactsComplete(Exception):
+    pass
+
+
+class _PageFactsParser(HTMLParser):
+    """Collects title, summary and first date in one pass over the markup.
+
+    No tree is built: only the text of the first <h1>, the <title>, and the
+    current <p> is buffered. Parsing stops as soon as the first <h1> is closed,
+    a date has been seen and the summary is settled -- either a meta
+    description, or the first long paragraph once <body> has started (a meta
+    description is only expected in <head>).
+    """
+
+    _SKIPPED_TAGS = {"script", "style", "template"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.h1: Optional[str] = None
+        self.title: Optional[str] = None
+        self.og_title: Optional[str] = None
+        self.description: Optional[str] = None
+        self.paragraph: Optional[str] = None
+        self.date: Optional[str] = None
+        self._h1_parts: Optional[List[str]] = None
+        self._h1_done = False
+        self._title_parts: Optional[List[str]] = None
+        self._title_done = False
+        self._paragraph_parts: Optional[List[str]] = None
+        self._skip_depth = 0
+        self._in_body = False
+        self._text_tail = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "body":
+            self._in_body = True
+        elif tag == "meta":
+            self._handle_meta(dict(attrs))
+        elif tag == "h1" and not self._h1_done and self._h1_parts is None:
+            self._h1_parts = []
+        elif tag == "title" and not self._title_done and self._title_parts is None:
+            self._title_parts = []
+        elif tag == "p" and self.paragraph is None:
+            # <p> cannot nest, so a new one implicitly closes the previous.
+            self._close_paragraph()
+            self._paragraph_parts = []
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "h1" and self._h1_parts is not None:
+            self.h1 = " ".join(self._h1_parts) or None
+            self._h1_parts = None
+            self._h1_done = True
+        elif tag == "title" and self._title_parts is not None:
+            self.title = " ".join(self._title_parts) or None
+            self._title_parts = None
+            self._title_done = True
+        elif tag == "p":
+            self._close_paragraph()
+        self._stop_if_complete()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = data.strip()
+        if not text:
+            return
+        for parts in (self._h1_parts, self._title_parts, self._paragraph_parts):
+            if parts is not None:
+                parts.append(text)
+        if self.date is None:
+            # Keep a short tail so dates split across text nodes still match.
+            window = f"{self._text_tail} {text}"
+            self.date = _extract_date(window)
+            self._text_tail = window[-32:]
+        self._stop_if_complete()
 
-def _extract_title(soup: BeautifulSoup) -> Optional[str]:
-    for tag in ("h1", "title"):
-        node = soup.find(tag)
-        if node:
-            text = node.get_text(" ", strip=True)
-            if text:
-                return text
-    meta = soup.find("meta", attrs={"property": "og:title"})
-    if meta and meta.get("content"):
-        return meta["content"].strip()
-    return None
+    def _handle_meta(self, attrs):
+        content = (attrs.get("content") or "").strip()
+        if not content:
+            return
+        if self.description is None and attrs.get("name") == "description":
+            self.description = content
+        elif self.og_title is None and attrs.get("property") == "og:title":
+            self.og_title = content
 
+    def _close_paragraph(self):
+        if self._paragraph_parts is None:
+            return
+        text = " ".join(self._paragraph_parts)
+        self._paragraph_parts = None
+        if len(text) >= SUMMARY_MIN_LENGTH:
+            self.paragraph = text
 
-def _extract_summary(soup: BeautifulSoup) -> Optional[str]:
-    meta = soup.find("meta", attrs={"name": "description"})
-    if meta and meta.get("content"):
-        return meta["content"].strip()
-    for paragraph in soup.find_all("p"):
-        text = paragraph.get_text(" ", strip=True)
-        if text and len(text) >= 60:
-            return text
-    return None
+    def _stop_if_complete(self):
+        summary_done = self.description is not None or (self._in_body and self.paragraph is not None)
+        title_done = self._h1_done and (self.h1 is not None or self._title_done)
+        if title_done and self.date is not None and summary_done:
+            raise _FactsComplete()
 
 
 def _extract_date(text: str, url: Optional[str] = None) -> Optional[str]:
-    if text:
-        match = re.search(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})\b", text)
-        if match:
-            day, month, year = match.group(1), match.group(2), match.group(3)
-            year = f"20{year}" if len(year) == 2 else year
-            return f"{int(day):02d}.{int(month):02d}.{year}"
-
-        match = re.search(r"\b(20\d{2})[./-](\d{1,2})[./-](\d{1,2})\b", text)
-        if match:
-            year, month, day = match.group(1), match.group(2), match.group(3)
-            return f"{int(day):02d}.{int(month):02d}.{year}"
-
-    if url:
-        match = re.search(r"/(20\d{2})[/-](\d{1,2})[/-](\d{1,2})", url)
-        if match:
-            year, month, day = match.group(1), match.group(2), match.group(3)
-            return f"{int(day):02d}.{int(month):02d}.{year}"
-
-    return None
+    found = search_date(text)
+    if found is None and url:
+        found = date_from_url(url)
+    return format_date(found) if found else None
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusyError(RuntimeError):
+    """The hashing queue is full or a hash did not finish in time."""
+
+
+class PasswordHasher:
+    """Runs password hashing in a process pool so login bursts do not pin request threads.
+
+    At most ``max_pending`` hashes may be queued or running; further calls fail
+    immediately with HashingBusyError instead of piling up behind the pool.
+    With ``workers=0`` hashing runs inline (useful for tests and the debug
+    server). By default the cores are shared between the ``app_processes``
+    application processes on the host, so together they run one hash per core.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=None, max_pending=None, timeout=30.0, app_processes=1):
+        self.configure(method, workers, max_pending, timeout, app_processes)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'completed': 0, 'rejected': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+
+    def configure(self, method, workers=None, max_pending=None, timeout=30.0, app_processes=1):
+        self.method = method
+        self._method_prefix = None
+        if workers is None:
+            workers = max((os.cpu_count() or 1) // max(app_processes, 1), 1)
+        self.workers = workers
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self.timeout = timeout
+        self._pending = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when ``pwhash`` was made with other parameters than the configured method."""
+        return bool(pwhash) and pwhash.split('$', 1)[0] != self.method_prefix()
+
+    def method_prefix(self):
+        """The method as Werkzeug writes it into hashes: "scrypt" becomes "scrypt:32768:8:1"."""
+        if self._method_prefix is None:
+            # One real hash, once per configuration, so Werkzeug's defaults are never guessed.
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._method_prefix
+
+    def stats(self):
+        with self._stats_lock:
+            completed = self._stats['completed']
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_depth': self._pending,
+                'completed': completed,
+                'rejected': self._stats['rejected'],
+                'avg_latency_ms': round(self._stats['total_seconds'] / completed * 1000, 2) if completed else 0.0,
+                'max_latency_ms': round(self._stats['max_seconds'] * 1000, 2),
+            }
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise HashingBusyError('Password hashing queue is full')
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._pending += 1
+        if self.workers == 0:
+            try:
+                return func(*args)
+            finally:
+                self._finish(started)
+
+        pool = self._get_pool()
+        try:
+            future = pool.submit(func, *args)
+        except BrokenProcessPool:
+            self._finish(started)
+            self._discard_pool(pool)
+            raise HashingBusyError('Password hashing pool failed') from None
+        except Exception:
+            self._finish(started)
+            raise
+        # The slot is freed when the hash really finishes, even if we stop waiting.
+        future.add_done_callback(lambda _: self._finish(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusyError('Password hashing timed out') from None
+        except BrokenProcessPool:
+            # A pool process died (e.g. OOM-killed); the next call gets a new pool.
+            self._discard_pool(pool)
+            raise HashingBusyError('Password hashing pool failed') from None
+
+    def _finish(self, started):
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._pending -= 1
+            self._stats['completed'] += 1
+            self._stats['total_seconds'] += elapsed
+            self._stats['max_seconds'] = max(self._stats['max_seconds'], elapsed)
+        self._slots.release()
+
+    def _discard_pool(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _get_pool(self):
+        # A pool inherited through fork() is unusable, so every process gets its own.
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # Never fork the pool from this process: it already runs request and
+                # refresher threads whose locks a forked child would inherit. Unlike
+                # forkserver, spawn keeps no per-process server that a fork would break.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+
+hasher = PasswordHasher()
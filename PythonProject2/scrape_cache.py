@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+
+class MemoryCacheBackend:
+    """Process-local backend; useful for tests and single-process deployments."""
+
+    def __init__(self) -> None:
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._leases: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str) -> Optional[Dict[str, Any]]:
+        return self._snapshots.get(kind)
+
+    def set(self, kind: str, snapshot: Dict[str, Any]) -> None:
+        self._snapshots[kind] = snapshot
+
+    def acquire(self, kind: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(kind)
+            if lease and lease[1] > now:
+                return None
+            self._leases[kind] = (token, now + ttl)
+        return token
+
+    def release(self, kind: str, token: str) -> None:
+        with self._lock:
+            lease = self._leases.get(kind)
+            if lease and lease[0] == token:
+                del self._leases[kind]
+
+
+class SQLiteCacheBackend:
+    """Snapshots shared by every worker on the host through one SQLite file.
+
+    A snapshot is replaced with a single ``INSERT OR REPLACE``, so readers see
+    either the old or the new list, never a mix. The rebuild lock is a lease
+    row with an expiry, so a worker that dies mid-refresh does not block the
+    others for longer than ``ttl``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot ("
+                "kind TEXT PRIMARY KEY, ts REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS refresh_lock ("
+                "kind TEXT PRIMARY KEY, token TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def get(self, kind: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT payload FROM snapshot WHERE kind = ?", (kind,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, kind: str, snapshot: Dict[str, Any]) -> None:
+        payload = json.dumps(snapshot, ensure_ascii=False)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshot (kind, ts, payload) VALUES (?, ?, ?)",
+                (kind, snapshot["ts"], payload),
+            )
+
+    def acquire(self, kind: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT expires FROM refresh_lock WHERE kind = ?", (kind,)
+            ).fetchone()
+            if row and row[0] > now:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "INSERT OR REPLACE INTO refresh_lock (kind, token, expires) VALUES (?, ?, ?)",
+                (kind, token, now + ttl),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def release(self, kind: str, token: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM refresh_lock WHERE kind = ? AND token = ?", (kind, token)
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class RedisCacheBackend:
+    """Snapshots in Redis, for deployments that span several hosts."""
+
+    _RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url: str, prefix: str = "olympiad") -> None:
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, kind: str) -> Optional[Dict[str, Any]]:
+        payload = self._client.get(f"{self._prefix}:snapshot:{kind}")
+        return json.loads(payload) if payload else None
+
+    def set(self, kind: str, snapshot: Dict[str, Any]) -> None:
+        self._client.set(
+            f"{self._prefix}:snapshot:{kind}",
+            json.dumps(snapshot, ensure_ascii=False),
+        )
+
+    def acquire(self, kind: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = self._client.set(
+            f"{self._prefix}:lock:{kind}", token, nx=True, px=int(ttl * 1000)
+        )
+        return token if acquired else None
+
+    def release(self, kind: str, token: str) -> None:
+        self._client.eval(self._RELEASE_SCRIPT, 1, f"{self._prefix}:lock:{kind}", token)
+
+
+class PageCache:
+    """Per-URL HTTP validators and the facts extracted from the last body.
+
+    Entries live in memory and, when ``directory`` is given, in one JSON file
+    per URL so they survive restarts. Files are written to a temporary name
+    and renamed into place.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None or not self.directory:
+            return entry
+        try:
+            with open(self._path(url), encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def set(self, url: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[url] = entry
+        if not self.directory:
+            return
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(entry, handle, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _path(self, url: str) -> str:
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+
+def cache_backend_from_url(url: str):
+    if url.startswith("memory://"):
+        return MemoryCacheBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteCacheBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unsupported scrape cache URL: {url}")
@@ -0,0 +1,165 @@
+"""Full-text search over approved theory materials.
+
+On SQLite the index is an FTS5 table ``submission_fts`` keyed by submission
+id. Titles and descriptions are normalised in Python before they are stored
+(lower case, ё -> е, a light Russian suffix stemmer), and queries go through
+the same normalisation, so "задачами" finds "Задача" and "ёлка" finds "елка".
+Every query term is a prefix match; results are ranked with bm25, titles
+weighted above descriptions.
+
+The index is maintained row by row from the moderation views
+(index_submissions / unindex_submissions) inside their transaction; it is
+only built in full once, by the migration that creates it. Other databases
+fall back to a case-insensitive substring match.
+"""
+import re
+
+from sqlalchemy import bindparam, func, or_, select, text
+
+from models import db, Submission
+
+FTS_TABLE = 'submission_fts'
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_QUERY_TERMS = 8
+MIN_STEM_LENGTH = 3
+
+_WORD = re.compile(r'\w+')
+_CYRILLIC = re.compile(r'[а-я]')
+# Noun, adjective and participle endings, longest first.
+_SUFFIXES = sorted(
+    {
+        'иями', 'ями', 'ами', 'иях', 'ях', 'ах', 'ией', 'ий', 'ей', 'ой', 'ый', 'ая', 'яя', 'ое', 'ее', 'ие', 'ые',
+        'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ых', 'их', 'ую', 'юю', 'ою', 'ею', 'ом', 'ем', 'ам', 'ям', 'ов',
+        'ев', 'ию', 'ью', 'ия', 'ья', 'ии', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    },
+    key=len,
+    reverse=True,
+)
+
+_state = {'fts': None}
+
+
+def normalize(value):
+    return (value or '').lower().replace('ё', 'е')
+
+
+def stem(word):
+    if not _CYRILLIC.match(word):
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokens(value):
+    return [stem(word) for word in _WORD.findall(normalize(value))]
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for a user query: every term as a quoted prefix, ANDed."""
+    terms = tokens(query)[:MAX_QUERY_TERMS]
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def create_index(connection):
+    """Create and fill the FTS table (migration helper); a no-op on non-SQLite databases."""
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(
+        text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description, tokenize='unicode61')")
+    )
+    rows = connection.execute(
+        select(Submission.id, Submission.title, Submission.description).where(Submission.status == 'approved')
+    )
+    connection.execute(text(f'DELETE FROM {FTS_TABLE}'))
+    _insert_rows(connection, rows)
+
+
+def _insert_rows(connection, rows):
+    params = [
+        {'id': row.id, 'title': ' '.join(tokens(row.title)), 'description': ' '.join(tokens(row.description))}
+        for row in rows
+    ]
+    if params:
+        connection.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)'),
+            params,
+        )
+
+
+def fts_available():
+    if _state['fts'] is None:
+        if db.engine.dialect.name != 'sqlite':
+            _state['fts'] = False
+        else:
+            with db.engine.connect() as connection:
+                _state['fts'] = bool(
+                    connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': FTS_TABLE},
+                    ).scalar()
+                )
+    return _state['fts']
+
+
+def _delete_rows(ids):
+    db.session.execute(
+        text(f'DELETE FROM {FTS_TABLE} WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(ids)},
+    )
+
+
+def index_submissions(ids):
+    """(Re)index the approved ones among ``ids`` and drop the rest; runs in the current session."""
+    ids = list(ids)
+    if not ids or not fts_available():
+        return
+    _delete_rows(ids)
+    rows = db.session.execute(
+        select(Submission.id, Submission.title, Submission.description).where(
+            Submission.id.in_(ids), Submission.status == 'approved'
+        )
+    )
+    _insert_rows(db.session, rows)
+
+
+def unindex_submissions(ids):
+    ids = list(ids)
+    if ids and fts_available():
+        _delete_rows(ids)
+
+
+def search(query, limit, offset=0):
+    """Ids of approved submissions matching ``query``, best match first."""
+    if fts_available():
+        expression = match_expression(query)
+        if not expression:
+            return []
+        return list(
+            db.session.execute(
+                text(
+                    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression '
+                    f'ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) LIMIT :limit OFFSET :offset'
+                ),
+                {'expression': expression, 'limit': limit, 'offset': offset},
+            ).scalars()
+        )
+
+    needle = normalize(query).strip()
+    if not needle:
+        return []
+    pattern = f'%{needle}%'
+    return list(
+        db.session.execute(
+            select(Submission.id)
+            .where(
+                Submission.status == 'approved',
+                or_(func.lower(Submission.title).like(pattern), func.lower(Submission.description).like(pattern)),
+            )
+            .order_by(Submission.created_at.desc(), Submission.id.desc())
+            .limit(limit)
+            .offset(offset)
+        ).scalars()
+    )
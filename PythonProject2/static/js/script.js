@@ -72,4 +72,114 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         }
     }
+
+    // Выбор всех заявок для массовой модерации
+    const selectAll = document.querySelector('.bulk-select-all');
+    if (selectAll) {
+        selectAll.addEventListener('change', () => {
+            document.querySelectorAll('.bulk-select').forEach(box => {
+                box.checked = selectAll.checked;
+            });
+        });
+    }
+
+    // Большие файлы загружаются частями с докачкой после обрыва соединения
+    const uploadForm = document.querySelector('.upload-form');
+    if (uploadForm && window.fetch) {
+        const CHUNK_SIZE = 8 * 1024 * 1024;
+        const MAX_RETRIES = 5;
+        const progress = uploadForm.querySelector('.upload-progress');
+        const progressBar = progress ? progress.querySelector('.progress-bar') : null;
+
+        const showProgress = (sent, total) => {
+            if (progressBar) {
+                progressBar.style.width = Math.floor(sent * 100 / total) + '%';
+            }
+        };
+
+        const sendFile = async (kind, file, onProgress) => {
+            const body = new FormData();
+            body.append('kind', kind);
+            body.append('filename', file.name);
+            body.append('length', file.size);
+            const created = await fetch(uploadForm.dataset.sessionsUrl, {method: 'POST', body: body});
+            if (!created.ok) {
+                throw new Error((await created.json()).error || 'Не удалось начать загрузку');
+            }
+            const location = created.headers.get('Location');
+            const rejected = 'Загрузка отклонена сервером';
+            let offset = 0;
+            let retries = 0;
+            let resync = false;
+            while (offset < file.size) {
+                try {
+                    const response = resync
+                        ? await fetch(location, {method: 'HEAD'})
+                        : await fetch(location, {
+                            method: 'PATCH',
+                            headers: {
+                                'Content-Type': 'application/offset+octet-stream',
+                                'Upload-Offset': String(offset),
+                            },
+                            body: file.slice(offset, offset + CHUNK_SIZE),
+                        });
+                    if (response.status === 413 || response.status === 404) {
+                        throw new Error(rejected);
+                    }
+                    const reported = response.headers.get('Upload-Offset');
+                    if (reported === null) {
+                        throw new Error('Сбой при загрузке файла');
+                    }
+                    offset = parseInt(reported, 10);
+                    retries = 0;
+                    resync = false;
+                } catch (error) {
+                    if (error.message === rejected || retries >= MAX_RETRIES) {
+                        throw error;
+                    }
+                    retries += 1;
+                    resync = true;
+                    await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** retries));
+                }
+                onProgress(offset);
+            }
+            return location.split('/').pop();
+        };
+
+        uploadForm.addEventListener('submit', async (e) => {
+            const inputs = ['file', 'video']
+                .map(kind => [kind, uploadForm.querySelector('#' + kind).files[0]])
+                .filter(([, file]) => file);
+            const total = inputs.reduce((sum, [, file]) => sum + file.size, 0);
+            if (total < CHUNK_SIZE) {
+                return;
+            }
+            e.preventDefault();
+            const submitButton = uploadForm.querySelector('button[type="submit"]');
+            submitButton.disabled = true;
+            if (progress) {
+                progress.classList.remove('d-none');
+            }
+            try {
+                const complete = new FormData();
+                complete.append('title', uploadForm.querySelector('#title').value);
+                complete.append('description', uploadForm.querySelector('#description').value);
+                let done = 0;
+                for (const [kind, file] of inputs) {
+                    const id = await sendFile(kind, file, sent => showProgress(done + sent, total));
+                    done += file.size;
+                    complete.append(kind + '_upload', id);
+                }
+                const response = await fetch(uploadForm.dataset.completeUrl, {method: 'POST', body: complete});
+                const result = await response.json();
+                if (!response.ok) {
+                    throw new Error(result.error || 'Не удалось завершить загрузку');
+                }
+                window.location = result.redirect;
+            } catch (error) {
+                alert(error.message);
+                submitButton.disabled = false;
+            }
+        });
+    }
 });
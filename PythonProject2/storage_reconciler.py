@@ -0,0 +1,237 @@
+"""Reconcile the upload directory with the database.
+
+The upload root is split into shards: the legacy ``files`` and ``videos``
+directories, ``tmp`` and the 256 ``blobs/<aa>`` directories. One step of the
+reconciler scans a single shard with ``os.scandir`` and checks its files
+against the database in batches, then walks the next batch of StoredBlob and
+Submission rows in primary-key order. Neither side is ever loaded in full.
+
+A step finds:
+
+* orphan files - no StoredBlob or Submission refers to them (in ``tmp``:
+  staged parts and resumable uploads without a session). They are removed.
+* dangling blob rows - the file is gone. The row is removed.
+* wrong reference counts - ref_count is corrected to the number of
+  submissions using the blob; a blob nobody uses is removed, its file by a
+  remove_uploads job queued in the same transaction.
+* submissions whose file is missing - only reported; the row is user content.
+
+Files and rows younger than RECONCILE_GRACE_SECONDS are left alone, so
+uploads in flight are never touched, and a blob row is only changed if its
+ref_count is still the one the step read. The ``reconcile_storage`` job runs one
+step and queues the next one RECONCILE_STEP_SECONDS later.
+"""
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, or_, select, update
+
+from jobs import enqueue, handler
+from models import db, Job, StoredBlob, Submission, UploadSession
+from upload_storage import BLOB_DIR, TMP_DIR
+
+LEGACY_DIRS = ('files', 'videos')
+SHARDS = LEGACY_DIRS + (TMP_DIR,) + tuple(os.path.join(BLOB_DIR, f'{i:02x}') for i in range(256))
+BATCH_SIZE = 500
+JOB_NAME = 'reconcile_storage'
+REPORT_SAMPLE_SIZE = 20
+
+
+def new_report():
+    return {
+        'orphan_files': 0,
+        'orphan_bytes': 0,
+        'dangling_blobs': 0,
+        'ref_counts_fixed': 0,
+        'unused_blobs': 0,
+        'missing_submission_files': 0,
+        'samples': [],
+    }
+
+
+def _note(report, key, detail, size=0):
+    report[key] += 1
+    if key == 'orphan_files':
+        report['orphan_bytes'] += size
+    if len(report['samples']) < REPORT_SAMPLE_SIZE:
+        report['samples'].append(f'{key}: {detail}')
+
+
+def _scan_batches(directory, older_than):
+    """Yield lists of (name, size) for regular files last modified before ``older_than``."""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    batch = []
+    with entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime >= older_than:
+                continue
+            batch.append((entry.name, stat.st_size))
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _referenced_paths(paths):
+    referenced = set(db.session.execute(select(StoredBlob.path).where(StoredBlob.path.in_(paths))).scalars())
+    for column in (Submission.file_path, Submission.video_path):
+        referenced.update(db.session.execute(select(column).where(column.in_(paths))).scalars())
+    return referenced
+
+
+def _live_upload_sessions(names):
+    ids = [name[: -len('.upload')] for name in names if name.endswith('.upload')]
+    return set(db.session.execute(select(UploadSession.id).where(UploadSession.id.in_(ids))).scalars())
+
+
+def reconcile_shard(upload_root, shard, grace_seconds, dry_run, report):
+    directory = os.path.join(upload_root, shard)
+    for batch in _scan_batches(directory, time.time() - grace_seconds):
+        if shard == TMP_DIR:
+            live = _live_upload_sessions(name for name, _ in batch)
+            orphans = [(name, size) for name, size in batch if name[: -len('.upload')] not in live]
+        else:
+            referenced = _referenced_paths([os.path.join(shard, name) for name, _ in batch])
+            orphans = [(name, size) for name, size in batch if os.path.join(shard, name) not in referenced]
+        for name, size in orphans:
+            _note(report, 'orphan_files', os.path.join(shard, name), size)
+            if not dry_run:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def _reference_counts(paths):
+    counts = Counter()
+    for column in (Submission.file_path, Submission.video_path):
+        counts.update(
+            dict(
+                db.session.execute(
+                    select(column, func.count()).where(column.in_(paths)).group_by(column)
+                ).all()
+            )
+        )
+    return counts
+
+
+def _unchanged(blob):
+    """Match ``blob``'s row only while its ref_count is still the value read."""
+    return (StoredBlob.sha256 == blob.sha256) & (StoredBlob.ref_count == blob.ref_count)
+
+
+def _delete_unchanged(blob):
+    return db.session.execute(delete(StoredBlob).where(_unchanged(blob))).rowcount == 1
+
+
+def _set_ref_count_unchanged(blob, ref_count):
+    return db.session.execute(update(StoredBlob).where(_unchanged(blob)).values(ref_count=ref_count)).rowcount == 1
+
+
+def reconcile_blob_rows(upload_root, after, grace_seconds, dry_run, report):
+    """Check one batch of StoredBlob rows after sha256 ``after``; returns the next cursor or None."""
+    rows = (
+        StoredBlob.query.filter(StoredBlob.sha256 > after)
+        .order_by(StoredBlob.sha256)
+        .limit(BATCH_SIZE)
+        .all()
+    )
+    counts = _reference_counts([row.path for row in rows])
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    unused_paths = []
+    for blob in rows:
+        if blob.created_at and blob.created_at >= cutoff:
+            continue
+        actual = counts[blob.path]
+        abs_path = os.path.join(upload_root, blob.path)
+        if not os.path.isfile(abs_path):
+            if dry_run or _delete_unchanged(blob):
+                _note(report, 'dangling_blobs', blob.path)
+        elif actual == 0:
+            size = os.path.getsize(abs_path)
+            if dry_run or _delete_unchanged(blob):
+                _note(report, 'unused_blobs', blob.path, size)
+                unused_paths.append(blob.path)
+        elif actual != blob.ref_count:
+            detail = f'{blob.path} {blob.ref_count} -> {actual}'
+            if dry_run or _set_ref_count_unchanged(blob, actual):
+                _note(report, 'ref_counts_fixed', detail)
+    if unused_paths and not dry_run:
+        enqueue('remove_uploads', {'paths': unused_paths})
+    return rows[-1].sha256 if len(rows) == BATCH_SIZE else None
+
+
+def reconcile_submission_rows(upload_root, after, report):
+    """Report submissions of one batch whose files are missing; returns the next cursor or None."""
+    rows = db.session.execute(
+        select(Submission.id, Submission.file_path, Submission.video_path)
+        .where(Submission.id > after, or_(Submission.file_path.isnot(None), Submission.video_path.isnot(None)))
+        .order_by(Submission.id)
+        .limit(BATCH_SIZE)
+    ).all()
+    for row in rows:
+        for path in (row.file_path, row.video_path):
+            if path and not os.path.isfile(os.path.join(upload_root, path)):
+                _note(report, 'missing_submission_files', f'submission {row.id}: {path}')
+    return rows[-1].id if len(rows) == BATCH_SIZE else None
+
+
+def reconcile_all(upload_root, grace_seconds, dry_run=False):
+    """One full pass over every shard and every row; used by ``flask reconcile-storage``."""
+    report = new_report()
+    for shard in SHARDS:
+        reconcile_shard(upload_root, shard, grace_seconds, dry_run, report)
+    blob_after = ''
+    while blob_after is not None:
+        blob_after = reconcile_blob_rows(upload_root, blob_after, grace_seconds, dry_run, report)
+        if not dry_run:
+            db.session.commit()
+    submission_after = 0
+    while submission_after is not None:
+        submission_after = reconcile_submission_rows(upload_root, submission_after, report)
+    return report
+
+
+def schedule_reconciler():
+    """Queue the incremental reconciler unless a step is already queued or running."""
+    pending = Job.query.filter(Job.name == JOB_NAME, Job.state.in_(('queued', 'running'))).count()
+    if pending:
+        return False
+    enqueue(JOB_NAME)
+    db.session.commit()
+    return True
+
+
+@handler(JOB_NAME)
+def reconcile_storage_step(shard=0, blob_after='', submission_after=0):
+    config = current_app.config
+    upload_root = config['UPLOAD_ROOT']
+    grace_seconds = config['RECONCILE_GRACE_SECONDS']
+    report = new_report()
+    reconcile_shard(upload_root, SHARDS[shard], grace_seconds, False, report)
+    # Row cursors become None at the end of their table and restart with the next cycle.
+    if blob_after is not None:
+        blob_after = reconcile_blob_rows(upload_root, blob_after, grace_seconds, False, report)
+    if submission_after is not None:
+        submission_after = reconcile_submission_rows(upload_root, submission_after, report)
+    if any(value for key, value in report.items() if key != 'samples'):
+        current_app.logger.warning('Storage reconciler (%s): %s', SHARDS[shard], report)
+
+    next_shard = (shard + 1) % len(SHARDS)
+    if next_shard == 0:
+        blob_after, submission_after = '', 0
+    enqueue(
+        JOB_NAME,
+        {'shard': next_shard, 'blob_after': blob_after, 'submission_after': submission_after},
+        delay=config['RECONCILE_STEP_SECONDS'],
+    )
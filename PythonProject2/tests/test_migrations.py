@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy.dialects import mysql, postgresql
+
+import migrations
+
+
+class RecordingConnection:
+    """Compiles every statement for ``dialect`` instead of running it."""
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.statements = []
+
+    def execute(self, statement, parameters=None):
+        self.statements.append(str(statement.compile(dialect=self.dialect)))
+
+
+def _migrate(monkeypatch, dialect):
+    # An old database: none of the added columns exist yet.
+    monkeypatch.setattr(migrations, '_columns', lambda connection, table_name: set())
+    monkeypatch.setattr(migrations, '_indexes', lambda connection, table_name: set())
+    connection = RecordingConnection(dialect)
+    for _, _, migrate in migrations.MIGRATIONS:
+        migrate(connection)
+    return connection.statements
+
+
+def test_postgresql_quotes_user_and_has_no_datetime(monkeypatch):
+    statements = _migrate(monkeypatch, postgresql.dialect())
+
+    assert 'ALTER TABLE "user" ADD COLUMN is_admin BOOLEAN DEFAULT false' in statements
+    assert any(statement.startswith('UPDATE "user" SET is_admin=') for statement in statements)
+    assert 'ALTER TABLE submission ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE' in statements
+    assert not [statement for statement in statements if 'DATETIME' in statement]
+    assert not [statement for statement in statements if ' user ' in statement or 'TABLE user' in statement]
+
+
+@pytest.mark.parametrize('dialect', [postgresql.dialect(), mysql.dialect()])
+def test_tables_and_indexes_are_created_only_if_missing(monkeypatch, dialect):
+    statements = _migrate(monkeypatch, dialect)
+
+    creates = [statement for statement in statements if statement.lstrip().startswith('CREATE')]
+    assert creates
+    assert all('IF NOT EXISTS' in statement for statement in creates)
+    assert any('ix_submission_status_created_at' in statement for statement in creates)
@@ -0,0 +1,41 @@
+import threading
+
+import olympiad_parser
+
+SLOW = "https://slow.example.org/"
+FAST = "https://fast.example.org/"
+
+
+def test_source_past_the_budget_opens_its_breaker(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    fetch_source_facts = olympiad_parser._fetch_source_facts
+
+    def fetch_page_facts(session, url):
+        if url == SLOW:
+            release.wait(5)
+        return {"date": None}
+
+    def tracked_fetch_source_facts(session, url, deadline):
+        try:
+            return fetch_source_facts(session, url, deadline)
+        finally:
+            if url == SLOW:
+                finished.set()
+
+    monkeypatch.setattr(olympiad_parser, "REFRESH_BUDGET_SECONDS", 0.2)
+    monkeypatch.setattr(olympiad_parser, "_fetch_page_facts", fetch_page_facts)
+    monkeypatch.setattr(olympiad_parser, "_fetch_source_facts", tracked_fetch_source_facts)
+    monkeypatch.setattr(olympiad_parser, "_SOURCE_HEALTH", {})
+    try:
+        results = olympiad_parser._fetch_all_facts([SLOW, FAST])
+        assert results == {FAST: {"date": None}}
+        assert olympiad_parser._circuit_open(SLOW)
+        assert not olympiad_parser._circuit_open(FAST)
+    finally:
+        release.set()
+
+    # The hung fetch completing after the budget does not close the breaker.
+    assert finished.wait(5)
+    assert olympiad_parser._circuit_open(SLOW)
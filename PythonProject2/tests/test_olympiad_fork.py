@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import olympiad_parser
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+
+
+def _in_child(check):
+    """Run ``check()`` in a forked child; returns its boolean result."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if check() else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status) == 0
+
+
+def test_locks_held_at_fork_are_free_in_the_child():
+    held = [olympiad_parser._REFRESH_LOCKS["news"], olympiad_parser._FETCH_STATE_LOCK]
+    for lock in held:
+        lock.acquire()
+    try:
+
+        def check():
+            locks = [olympiad_parser._REFRESH_LOCKS["news"], olympiad_parser._FETCH_STATE_LOCK]
+            return all(lock.acquire(blocking=False) for lock in locks)
+
+        assert _in_child(check)
+    finally:
+        for lock in held:
+            lock.release()
+
+
+def test_child_refreshes_while_the_parent_holds_the_refresh_lock(monkeypatch):
+    monkeypatch.setitem(olympiad_parser._SHARED, "backend", None)
+    monkeypatch.setitem(olympiad_parser._CACHE, "news", {"ts": 0.0, "items": []})
+    builder = lambda: ([{"title": "t", "source": "https://example.org/"}], False)  # noqa: E731
+    lock = olympiad_parser._REFRESH_LOCKS["news"]
+    lock.acquire()
+    try:
+
+        def check():
+            refreshed = olympiad_parser._refresh("news", builder, ahead=True, blocking=False)
+            return refreshed and len(olympiad_parser._CACHE["news"]["items"]) == 1
+
+        assert _in_child(check)
+    finally:
+        lock.release()
+
+
+def test_fetch_state_is_rebuilt_in_the_child():
+    olympiad_parser._fetch_resources()
+
+    def check():
+        return olympiad_parser._FETCH_STATE["pid"] is None and olympiad_parser._FETCH_STATE["pool"] is None
+
+    assert _in_child(check)
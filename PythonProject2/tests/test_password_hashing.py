@@ -0,0 +1,33 @@
+import os
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from password_hashing import HashingBusyError, PasswordHasher
+
+
+def test_short_method_name_does_not_force_a_rehash():
+    hasher = PasswordHasher('scrypt', workers=0)
+    pwhash = hasher.hash('secret')
+    assert pwhash.startswith('scrypt:32768:8:1$')
+    assert not hasher.needs_rehash(pwhash)
+
+
+def test_other_parameters_need_a_rehash():
+    hasher = PasswordHasher('scrypt', workers=0)
+    assert hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+    assert hasher.needs_rehash(generate_password_hash('secret', 'scrypt:16384:8:1'))
+    assert not hasher.needs_rehash(None)
+
+
+def test_broken_pool_is_replaced():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, timeout=60)
+    try:
+        # Kills the pool process the way an OOM kill would.
+        with pytest.raises(HashingBusyError):
+            hasher._run(os._exit, 1)
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+        assert hasher.stats()['queue_depth'] == 0
+    finally:
+        if hasher._pool is not None:
+            hasher._pool.shutdown()
@@ -0,0 +1,72 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import update
+
+import storage_reconciler
+from models import db, Job, StoredBlob
+
+BLOB_PATH = os.path.join('blobs', 'ab', 'ab.pdf')
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "db.sqlite"}'
+    app.config['UPLOAD_ROOT'] = str(tmp_path / 'uploads')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        os.makedirs(os.path.join(app.config['UPLOAD_ROOT'], 'blobs', 'ab'))
+        with open(os.path.join(app.config['UPLOAD_ROOT'], BLOB_PATH), 'wb') as out:
+            out.write(b'%PDF')
+        # An unused blob whose count was left at 1, old enough to be reconciled.
+        db.session.add(
+            StoredBlob(
+                sha256='ab', path=BLOB_PATH, size=4, ref_count=1, created_at=datetime.utcnow() - timedelta(days=1)
+            )
+        )
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def _reconcile(app):
+    report = storage_reconciler.new_report()
+    storage_reconciler.reconcile_blob_rows(app.config['UPLOAD_ROOT'], '', 0, False, report)
+    return report
+
+
+def test_unused_blob_file_is_removed_by_a_job_after_commit(app):
+    with app.app_context():
+        report = _reconcile(app)
+
+        assert report['unused_blobs'] == 1
+        assert os.path.isfile(os.path.join(app.config['UPLOAD_ROOT'], BLOB_PATH))
+        db.session.commit()
+        assert db.session.get(StoredBlob, 'ab') is None
+        job = Job.query.one()
+        assert (job.name, json.loads(job.payload)) == ('remove_uploads', {'paths': [BLOB_PATH]})
+
+
+def test_blob_referenced_meanwhile_is_kept(app, monkeypatch):
+    reference_counts = storage_reconciler._reference_counts
+
+    def counts_then_new_upload(paths):
+        counts = reference_counts(paths)
+        # An upload of the same content lands between the count and the delete.
+        db.session.execute(update(StoredBlob.__table__).values(ref_count=StoredBlob.__table__.c.ref_count + 1))
+        return counts
+
+    monkeypatch.setattr(storage_reconciler, '_reference_counts', counts_then_new_upload)
+    with app.app_context():
+        report = _reconcile(app)
+        db.session.commit()
+
+        assert report['unused_blobs'] == 0
+        assert db.session.get(StoredBlob, 'ab').ref_count == 2
+        assert Job.query.count() == 0
+        assert os.path.isfile(os.path.join(app.config['UPLOAD_ROOT'], BLOB_PATH))
@@ -0,0 +1,206 @@
+"""Content-addressed storage for uploaded files.
+
+File parts of a multipart upload are written by Werkzeug's form parser
+straight into a SpooledUpload under ``tmp/``, which hashes them as they
+arrive, so memory use does not depend on the file size, each file is written
+to disk once, and an oversized file is rejected as soon as it crosses the
+limit of its form field (UploadFormDataParser). The finished file is then moved to ``blobs/<aa>/<sha256><ext>`` under
+the upload root; identical content uploaded again only bumps the StoredBlob
+reference count.
+
+Resumable uploads append their chunks to ``tmp/<session id>.upload`` with
+write_chunk and go through stage_file once the last byte has arrived.
+"""
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import select
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser, MultiPartParser
+
+from jobs import handler
+from models import db, StoredBlob
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_DIR = 'blobs'
+TMP_DIR = 'tmp'
+
+
+class UploadTooLargeError(RequestEntityTooLarge):
+    # Not a ValueError: Werkzeug's form parser would swallow that and return an empty form.
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f'Upload exceeds {max_bytes} bytes')
+        self.max_bytes = max_bytes
+
+
+class StagedUpload(NamedTuple):
+    tmp_path: str
+    sha256: str
+    size: int
+    extension: str
+
+
+class SpooledUpload:
+    """Writable file for one multipart file part, used as Werkzeug's ``stream_factory``.
+
+    The part goes to ``tmp/`` under ``upload_root`` and is hashed on the way.
+    Unless ``stage()`` hands it over to commit_staged, ``close()`` (called when
+    the request is closed) removes it.
+    """
+
+    def __init__(self, upload_root: str, extension: str, max_bytes: int) -> None:
+        tmp_dir = os.path.join(upload_root, TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self._staged = False
+        self.size = 0
+        self.extension = extension
+        self.max_bytes = max_bytes
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(self.max_bytes)
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read, seek, tell, ... for FileStorage
+        return getattr(self._file, name)
+
+    def stage(self) -> StagedUpload:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._staged = True
+        return StagedUpload(self.path, self._digest.hexdigest(), self.size, self.extension)
+
+    def close(self) -> None:
+        self._file.close()
+        if not self._staged:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class _FieldLimitParser(MultiPartParser):
+    def __init__(self, field_limits: Dict[str, int], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.field_limits = field_limits
+
+    def start_file_streaming(self, event, total_content_length):
+        container = super().start_file_streaming(event, total_content_length)
+        if event.name in self.field_limits:
+            container.max_bytes = self.field_limits[event.name]
+        return container
+
+
+class UploadFormDataParser(FormDataParser):
+    """Caps each file part at the limit of its form field.
+
+    ``field_limits`` maps field names to byte limits; parts of other fields
+    keep the limit their SpooledUpload was created with.
+    """
+
+    field_limits: Dict[str, int] = {}
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        # Werkzeug 2.3's implementation, with the part parser swapped.
+        parser = _FieldLimitParser(
+            self.field_limits,
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+        )
+        boundary = options.get('boundary', '').encode('ascii')
+        if not boundary:
+            raise ValueError('Missing boundary')
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+def stage_file(path: str, extension: str) -> StagedUpload:
+    """Hash a file that is already on disk under the upload root (a finished resumable upload)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            size += len(chunk)
+            digest.update(chunk)
+    return StagedUpload(path, digest.hexdigest(), size, extension)
+
+
+def session_part_path(upload_root: str, session_id: str) -> str:
+    return os.path.join(upload_root, TMP_DIR, f'{session_id}.upload')
+
+
+def write_chunk(path: str, offset: int, stream: BinaryIO, max_bytes: int) -> int:
+    """Write ``stream`` into ``path`` starting at ``offset``; returns the number of bytes written.
+
+    A client that disconnects mid-chunk keeps whatever arrived, so it can
+    resume from the new offset instead of resending the whole chunk.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    open(path, 'ab').close()
+    with open(path, 'r+b') as out:
+        out.seek(offset)
+        while True:
+            try:
+                chunk = stream.read(CHUNK_SIZE)
+            except ClientDisconnected:
+                break
+            if not chunk:
+                break
+            if written + len(chunk) > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            out.write(chunk)
+            written += len(chunk)
+        # The new offset is only acknowledged once the bytes are on disk.
+        out.flush()
+        os.fsync(out.fileno())
+    return written
+
+
+def commit_staged(staged: StagedUpload, upload_root: str) -> str:
+    """Register a staged upload as a blob and return its path relative to ``upload_root``.
+
+    Runs inside the caller's database transaction; the caller commits.
+    """
+    sha256 = staged.sha256
+    candidate = os.path.join(BLOB_DIR, sha256[:2], sha256 + staged.extension)
+    relative_path = StoredBlob.add_reference(sha256, candidate, staged.size)
+    final_path = os.path.join(upload_root, relative_path)
+    if os.path.exists(final_path):
+        os.unlink(staged.tmp_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(staged.tmp_path, final_path)
+    return relative_path
+
+
+def release_uploads(relative_paths: Iterable[Optional[str]]) -> List[str]:
+    """Drop one reference per path and return the paths nothing refers to any more.
+
+    Runs in the caller's transaction. The files themselves are unlinked later
+    by the remove_uploads job, queued in that same transaction.
+    """
+    return sorted(StoredBlob.drop_references(relative_paths))
+
+
+@handler('remove_uploads')
+def remove_uploads(paths: List[str]) -> None:
+    upload_root = current_app.config['UPLOAD_ROOT']
+    # The same content may have been uploaded again since the job was queued.
+    reused = set(db.session.execute(select(StoredBlob.path).where(StoredBlob.path.in_(paths))).scalars())
+    for relative_path in paths:
+        abs_path = os.path.join(upload_root, relative_path)
+        if relative_path not in reused and os.path.isfile(abs_path):
+            os.remove(abs_path)